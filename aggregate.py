@@ -1,14 +1,17 @@
 import argparse, json, os, datetime
-from glob import glob
+from concurrent.futures import ThreadPoolExecutor
 from statistics import mean
+from ogc.resultstore import STORE_NAME, ResultStore
+
+TESTS = ("t2", "t3", "cstar")
+# geparste Zeilen pro JSON-Datei, Schlüssel (Pfad, Größe, mtime), und pro Store die Zeilen
+# bis max(id); liegt unter --root
+MANIFEST = ".aggregate_manifest.json"
+MANIFEST_VERSION = 2
 
 def _ts():
     return datetime.datetime.now().isoformat(timespec="seconds")
 
-def _list(dirpath, sub):
-    p = os.path.join(dirpath, sub, "*.json")
-    return sorted(glob(p))
-
 def _safe_get_pfinal(obj):
     res = obj.get("result", {})
     if "p_value_final" in res and res["p_value_final"] is not None:
@@ -18,63 +21,212 @@ def _safe_get_pfinal(obj):
         return float(res["p_value"])
     return None
 
-def _load_row_t2(path):
-    with open(path, "r", encoding="utf-8") as f:
-        j = json.load(f)
-    prm = j.get("params", {})
-    res = j.get("result", {})
+def _row_t2(run):
+    prm = run.get("params", {})
+    res = run.get("result", {})
     return {
-        "file": os.path.basename(path),
-        "mtime": datetime.datetime.fromtimestamp(os.path.getmtime(path)).isoformat(timespec="seconds"),
+        "file": run["run_id"],
+        "mtime": run["created"][:19],
         "seed": prm.get("seed"),
         "stat": res.get("stat"),
         "p_value_flip": res.get("p_value_flip"),
         "p_value_phase": res.get("p_value_phase"),
-        "p_value_final": _safe_get_pfinal(j),
+        "p_value_final": _safe_get_pfinal(run),
     }
 
-def _load_row_t3(path):
-    with open(path, "r", encoding="utf-8") as f:
-        j = json.load(f)
-    prm = j.get("params", {})
-    res = j.get("result", {})
+def _row_t3(run):
+    res = run.get("result", {})
     return {
-        "file": os.path.basename(path),
-        "mtime": datetime.datetime.fromtimestamp(os.path.getmtime(path)).isoformat(timespec="seconds"),
+        "file": run["run_id"],
+        "mtime": run["created"][:19],
         "A_loop": res.get("A_loop"),
     }
 
-def _load_row_cstar(path):
-    with open(path, "r", encoding="utf-8") as f:
-        j = json.load(f)
-    prm = j.get("params", {})
-    res = j.get("result", {})
+def _row_cstar(run):
+    res = run.get("result", {})
     return {
-        "file": os.path.basename(path),
-        "mtime": datetime.datetime.fromtimestamp(os.path.getmtime(path)).isoformat(timespec="seconds"),
+        "file": run["run_id"],
+        "mtime": run["created"][:19],
         "stat": res.get("stat"),
         "p_value": res.get("p_value"),
     }
 
+_ROW = {"t2": _row_t2, "t3": _row_t3, "cstar": _row_cstar}
+# was die Zeilen-Builder aus dem Store brauchen (json_extract statt vollem params/result)
+_FIELDS = {
+    "t2": ("params.seed", "result.stat", "result.p_value_flip", "result.p_value_phase",
+           "result.p_value_final", "result.p_value"),
+    "t3": ("result.A_loop",),
+    "cstar": ("result.stat", "result.p_value"),
+}
+
+def _since(spec):
+    # "2025-09-15" oder "2025-09-15T12:00" -> ISO auf Sekunden, vergleichbar mit row["mtime"]
+    return datetime.datetime.fromisoformat(spec).isoformat(timespec="seconds") if spec else None
+
+def _tag_of(root, dirpath):
+    # Tag = erster Unterordner unter root (result/<tag>/t2/...), None direkt unter root
+    rel = os.path.relpath(dirpath, root)
+    return None if rel == "." else rel.split(os.sep)[0]
+
+def _scan(root):
+    """
+    JSON-Dateien [(test, tag, path, size, mtime_ns)] und Stores [(tag, path)] unter root.
+    Ordner mit results.sqlite zählen nur über den Store (dort liegende JSONs sind Exporte).
+    """
+    files, stores = [], []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if d != "summary")
+        if STORE_NAME in filenames:
+            stores.append((_tag_of(root, dirpath), os.path.join(dirpath, STORE_NAME)))
+            dirnames[:] = [d for d in dirnames if d not in TESTS]
+        test = os.path.basename(dirpath)
+        if test not in TESTS or dirpath == root:
+            continue
+        tag = _tag_of(root, os.path.dirname(dirpath))
+        for fn in sorted(filenames):
+            if fn.endswith(".json"):
+                path = os.path.join(dirpath, fn)
+                st = os.stat(path)
+                files.append((test, tag, path, st.st_size, st.st_mtime_ns))
+    return files, stores
+
+def _parse(test, path, mtime_ns):
+    with open(path, "r", encoding="utf-8") as f:
+        j = json.load(f)
+    run = {"run_id": os.path.splitext(os.path.basename(path))[0],
+           "created": datetime.datetime.fromtimestamp(mtime_ns / 1e9).isoformat(timespec="seconds"),
+           "params": j.get("params", {}), "result": j.get("result", {})}
+    return _ROW[test](run)
+
+def _load_manifest(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            man = json.load(f)
+    except (OSError, ValueError):
+        return {}, {}
+    if man.get("version") != MANIFEST_VERSION:
+        return {}, {}
+    return man.get("files", {}), man.get("stores", {})
+
+def _store_rows(store, test, tag=None, since=None, after_id=None):
+    # nur Indexspalten + die Felder des Zeilen-Builders, kein volles JSON
+    for run in store.query(test, tag=tag, since=since, fields=_FIELDS[test], after_id=after_id):
+        yield run["id"], run["tag"], _ROW[test](run)
+
+def _read_store(path, cached, tag_filter):
+    """
+    Zeilen eines Stores als [{"id", "test", "tag", "row"}].
+    Mit Cache-Eintrag (max_id, count, rows): nur Zeilen mit id > max_id lesen; stimmt die
+    Anzahl danach nicht (Zeilen gelöscht/ersetzt), alles neu lesen.
+    Ohne Cache (cached=None): tag/since gehen direkt in die Abfrage (tag_filter = (tag, since)).
+    Rückgabe (Eintrag, Anzahl neu gelesener Zeilen).
+    """
+    tag, since = tag_filter
+    with ResultStore(path) as store:
+        if cached is None:
+            rows = [{"id": i, "test": t, "tag": rt, "row": row}
+                    for t in TESTS for i, rt, row in _store_rows(store, t, tag, since)]
+            return {"rows": rows}, len(rows)
+        after = cached.get("max_id", 0)
+        new = [{"id": i, "test": t, "tag": rt, "row": row}
+               for t in TESTS for i, rt, row in _store_rows(store, t, after_id=after)]
+        rows = cached.get("rows", []) + new
+        if len(rows) != store.count(test=list(TESTS)):
+            new = [{"id": i, "test": t, "tag": rt, "row": row} for t in TESTS for i, rt, row in _store_rows(store, t)]
+            rows = new
+    rows.sort(key=lambda e: e["id"])
+    return {"max_id": max((e["id"] for e in rows), default=after), "count": len(rows), "rows": rows}, len(new)
+
+def _save_manifest(path, entries, stores):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": MANIFEST_VERSION, "files": entries, "stores": stores}, f, ensure_ascii=False)
+        os.replace(tmp, path)
+    except OSError as e:
+        print(f"[manifest] nicht geschrieben: {e}")
+
+def collect(root, tag=None, since=None, workers=None, use_cache=True):
+    """
+    Zeilen pro Test {"t2": [...], "t3": [...], "cstar": [...]}, chronologisch.
+    Quellen: results.sqlite und JSON-Dateien unter root/**/{t2,t3,cstar}.
+    JSON-Zeilen kommen aus dem Manifest, solange (Pfad, Größe, mtime) passt; nur neue oder
+    geänderte Dateien werden im Thread-Pool geparst. Aus den Stores werden nur Indexspalten und
+    die benötigten Felder gelesen; das Manifest hält ihre Zeilen bis max(id), nachgelesen wird
+    nur id > max(id). tag/since filtern über den Index (Tag-Ordner bzw. Store-Spalte tag,
+    mtime/created >= since), ohne Dateien zu öffnen; ohne Cache gehen sie direkt in die Abfrage.
+    """
+    since = _since(since)
+    files, stores = _scan(root)
+    man_path = os.path.join(root, MANIFEST)
+    cached, cached_stores = _load_manifest(man_path) if use_cache else ({}, {})
+    entries, todo = {}, []
+    for test, ftag, path, size, mtime_ns in files:
+        key = os.path.relpath(path, root)
+        e = cached.get(key)
+        if e is not None and e["size"] == size and e["mtime_ns"] == mtime_ns:
+            entries[key] = e
+        else:
+            todo.append((key, test, ftag, path, size, mtime_ns))
+    if todo:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futs = [pool.submit(_parse, test, path, mtime_ns) for _, test, _, path, _, mtime_ns in todo]
+            for (key, test, ftag, path, size, mtime_ns), fu in zip(todo, futs):
+                try:
+                    row = fu.result()
+                except (OSError, ValueError) as e:
+                    print(f"[skip] {path}: {e}")
+                    continue
+                entries[key] = {"size": size, "mtime_ns": mtime_ns, "test": test, "tag": ftag, "row": row}
+    store_entries, n_store_new = {}, 0
+    for stag, spath in stores:
+        key = os.path.relpath(spath, root)
+        # ohne Cache: Tag-Filter in SQL, außer der Ordner-Tag passt schon (dann zählen auch Zeilen ohne Tag)
+        qtag = None if tag is None or tag == stag else tag
+        store_entries[key], n = _read_store(spath, cached_stores.get(key, {}) if use_cache else None, (qtag, since))
+        n_store_new += n
+    if use_cache and os.path.isdir(root) and (todo or n_store_new or len(entries) != len(cached)
+                                              or store_entries.keys() != cached_stores.keys()):
+        _save_manifest(man_path, entries, store_entries)
+    print(f"[manifest] {len(files)} JSON-Dateien, {len(todo)} neu geparst; "
+          f"{len(stores)} Store(s), {n_store_new} Zeilen neu gelesen\n")
+
+    out = {t: [] for t in TESTS}
+    for e in entries.values():
+        if (tag is None or e["tag"] == tag) and (since is None or e["row"]["mtime"] >= since):
+            out[e["test"]].append(e["row"])
+    for stag, spath in stores:
+        for e in store_entries[os.path.relpath(spath, root)]["rows"]:
+            # Store-Spalte tag vor Ordner-Tag
+            if (tag is None or (e["tag"] or stag) == tag) and (since is None or e["row"]["mtime"] >= since):
+                out[e["test"]].append(e["row"])
+    for rows in out.values():
+        rows.sort(key=lambda r: (r["mtime"], r["file"]))
+    return out
+
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--root", type=str, default="result")
-    ap.add_argument("--tag", type=str, default=None)
-    ap.add_argument("--since", type=str, default=None)  # optional ISO-Filter (nicht zwingend benutzt)
+    ap.add_argument("--tag", type=str, default=None, help="nur Läufe unter root/<tag>/ bzw. mit Store-Tag <tag>")
+    ap.add_argument("--since", type=str, default=None, help="nur Läufe ab ISO-Datum/-Zeit, z.B. 2025-09-15")
+    ap.add_argument("--workers", type=int, default=None, help="Threads zum Parsen neuer JSON-Dateien")
+    ap.add_argument("--no-cache", action="store_true", help="Manifest ignorieren und nicht schreiben")
     args = ap.parse_args()
 
     root = args.root
-    print(f"AGGREGATE REPORT  ({_ts()})" + (f"  —  tag={args.tag}" if args.tag else ""))
+    print(f"AGGREGATE REPORT  ({_ts()})" + (f"  —  tag={args.tag}" if args.tag else "")
+          + (f"  —  since={args.since}" if args.since else ""))
     print(f"root = {os.path.abspath(root)}\n")
+    runs = collect(root, tag=args.tag, since=args.since, workers=args.workers, use_cache=not args.no_cache)
 
     # --- T2
-    t2_files = _list(root, "t2")
-    if t2_files:
-        rows = [_load_row_t2(p) for p in t2_files]
+    rows = runs["t2"]
+    if rows:
         pvals = [r["p_value_final"] for r in rows if r["p_value_final"] is not None]
         seeds = [r["seed"] for r in rows if r["seed"] is not None]
         if pvals:
-            print(f"T2  files={len(rows)}    p_value_final: n={len(pvals)}, mean={round(mean(pvals), 4)}, min={round(min(pvals),4)}, max={round(max(pvals),4)}")
+            print(f"T2  runs={len(rows)}    p_value_final: n={len(pvals)}, mean={round(mean(pvals), 4)}, min={round(min(pvals),4)}, max={round(max(pvals),4)}")
             if seeds:
                 print(f"     seeds: {seeds[:50] if len(seeds)<=50 else seeds[:50] + ['...']}")
             print("     last 3:")
@@ -83,31 +235,29 @@ def main():
         else:
             print("T2: keine p-Werte gefunden (p_value_final/p_value).")
     else:
-        print("T2: keine Dateien gefunden.")
+        print("T2: keine Läufe gefunden.")
 
     # --- T3
-    t3_files = _list(root, "t3")
-    if t3_files:
-        rows = [_load_row_t3(p) for p in t3_files]
+    rows = runs["t3"]
+    if rows:
         aloops = [r["A_loop"] for r in rows if r["A_loop"] is not None]
         if aloops:
-            print(f"T3  files={len(rows)}    A_loop: n={len(aloops)}, mean={round(mean(aloops), 2)}, min={round(min(aloops),2)}, max={round(max(aloops),2)}")
+            print(f"T3  runs={len(rows)}    A_loop: n={len(aloops)}, mean={round(mean(aloops), 2)}, min={round(min(aloops),2)}, max={round(max(aloops),2)}")
         else:
             print("T3: keine A_loop gefunden.")
     else:
-        print("T3: keine Dateien gefunden.")
+        print("T3: keine Läufe gefunden.")
 
     # --- C*
-    cs_files = _list(root, "cstar")
-    if cs_files:
-        rows = [_load_row_cstar(p) for p in cs_files]
+    rows = runs["cstar"]
+    if rows:
         pvals = [r["p_value"] for r in rows if r["p_value"] is not None]
         if pvals:
-            print(f"C*  files={len(rows)}    p_value: n={len(pvals)}, mean={round(mean(pvals),3)}, min={round(min(pvals),3)}, max={round(max(pvals),3)}")
+            print(f"C*  runs={len(rows)}    p_value: n={len(pvals)}, mean={round(mean(pvals),3)}, min={round(min(pvals),3)}, max={round(max(pvals),3)}")
         else:
             print("C*: keine p-Werte gefunden.")
     else:
-        print("C*: keine Dateien gefunden.")
+        print("C*: keine Läufe gefunden.")
 
 if __name__ == "__main__":
     main()
@@ -1,18 +1,18 @@
 
-import json, os, argparse
+import argparse
 from pathlib import Path
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
-from glob import glob
+from ogc.resultstore import load_runs
 
 def load_rows(folder: str):
+    # folder: Ergebnisordner mit results.sqlite oder (ältere Läufe) der t2-Ordner mit *.json
     rows = []
-    for p in sorted(glob(os.path.join(folder, "*.json"))):
-        j = json.loads(Path(p).read_text(encoding="utf-8"))
-        prm, res = j.get("params", {}), j.get("result", {})
+    for r in load_runs(folder, "t2"):
+        prm, res = r["params"], r["result"]
         rows.append({
-            "file": os.path.basename(p),
+            "file": r["run_id"],
             "seed": prm.get("seed"),
             "stat": res.get("stat"),
             "p_phase": res.get("p_value_phase"),
@@ -30,15 +30,22 @@ def metrics_p(series, alpha=0.05):
 
 def main():
     ap = argparse.ArgumentParser()
-    ap.add_argument("--both", required=True, help="folder with t2/*.json (both)")
-    ap.add_argument("--phase", required=True, help="folder with t2/*.json (phase)")
+    ap.add_argument("--both", help="result folder (results.sqlite) or folder with t2/*.json (both)")
+    ap.add_argument("--phase", help="result folder (results.sqlite) or folder with t2/*.json (phase)")
+    ap.add_argument("--all", help="result folder (results.sqlite) or folder with t2/*.json (null-mode all): both view = p_final, phase view = p_phase")
     ap.add_argument("--out-dir", default="figure", help="directory for figures and tex")
     args = ap.parse_args()
+    if not args.all and not (args.both and args.phase):
+        ap.error("either --all or both --both and --phase are required")
 
     out = Path(args.out_dir); out.mkdir(parents=True, exist_ok=True)
 
-    df_b = load_rows(args.both)
-    df_p = load_rows(args.phase)
+    if args.all:
+        # ein Lauf mit null_mode="all" enthält beide Sichten
+        df_b = df_p = load_rows(args.all)
+    else:
+        df_b = load_rows(args.both)
+        df_p = load_rows(args.phase)
 
     m_b = metrics_p(df_b["p_final"] if "p_final" in df_b else pd.Series(dtype=float))
     m_p = metrics_p(df_p["p_phase"] if "p_phase" in df_p else pd.Series(dtype=float))
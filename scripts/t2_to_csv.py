@@ -1,14 +1,14 @@
-import json, os, csv, argparse
-from glob import glob
+import os, csv, argparse
 from pathlib import Path
+from ogc.resultstore import load_runs
 
 def rows(folder):
     out=[]
-    for p in sorted(glob(os.path.join(folder, "t2", "*.json"))):
-        j=json.loads(Path(p).read_text(encoding="utf-8"))
-        prm, res = j.get("params", {}), j.get("result", {})
+    # results.sqlite im Ordner, sonst folder/t2/*.json
+    for r in load_runs(folder, "t2"):
+        prm, res = r["params"], r["result"]
         out.append({
-            "file": os.path.basename(p),
+            "file": r["run_id"],
             "seed": prm.get("seed"),
             "stat": res.get("stat"),
             "p_phase": res.get("p_value_phase"),
@@ -32,8 +32,15 @@ def write_csv(path, rows):
 
 if __name__ == "__main__":
     ap=argparse.ArgumentParser()
-    ap.add_argument("--both", required=True)   # e.g. result\v2025-09-15_woop\both
-    ap.add_argument("--phase", required=True)  # e.g. result\v2025-09-15_woop\phase
+    ap.add_argument("--both")   # e.g. result\v2025-09-15_woop\both
+    ap.add_argument("--phase")  # e.g. result\v2025-09-15_woop\phase
+    ap.add_argument("--all")    # e.g. result\v2025-09-15_woop\all (null-mode all: p_phase + p_final in einer Zeile)
     args=ap.parse_args()
-    write_csv(os.path.join(args.both,  "summary","t2_rows.csv"), rows(args.both))
-    write_csv(os.path.join(args.phase, "summary","t2_rows.csv"), rows(args.phase))
+    if not (args.all or args.both or args.phase):
+        ap.error("one of --all, --both, --phase is required")
+    if args.all:
+        write_csv(os.path.join(args.all, "summary","t2_rows.csv"), rows(args.all))
+    if args.both:
+        write_csv(os.path.join(args.both,  "summary","t2_rows.csv"), rows(args.both))
+    if args.phase:
+        write_csv(os.path.join(args.phase, "summary","t2_rows.csv"), rows(args.phase))
@@ -1,16 +1,16 @@
 
-import json, os, argparse
+import os, argparse
 from pathlib import Path
 import numpy as np
 import matplotlib.pyplot as plt
-from glob import glob
+from ogc.resultstore import load_runs
+from ogc.t3_hysteresis import _trapz
 
 def load_rows(root: str):
     rows = []
-    for p in sorted(glob(os.path.join(root, "t3", "*.json"))):
-        j = json.loads(Path(p).read_text(encoding="utf-8"))
-        res = j.get("result", {}); prm = j.get("params", {})
-        rows.append({"path": p, "u": res.get("u_grid", []),
+    for r in load_runs(root, "t3"):
+        res, prm = r["result"], r["params"]
+        rows.append({"path": r["run_id"], "u": res.get("u_grid", []),
                      "fwd": res.get("forward", []),
                      "bwd": res.get("backward", []),
                      "A": res.get("A_loop"), "seed": prm.get("seed")})
@@ -34,7 +34,7 @@ def main():
 
     rows = load_rows(args.root)
     if not rows:
-        print("No T3 JSONs found."); return
+        print("No T3 runs found."); return
 
     rows = [r for r in rows if r["A"] is not None] or rows
     r = rows[len(rows)//2]
@@ -43,7 +43,7 @@ def main():
     Path(os.path.dirname(args.out_fig) or ".").mkdir(parents=True, exist_ok=True)
     plot_loop(u, fwd, bwd, args.out_fig)
 
-    A = float(r["A"]) if r["A"] is not None else float(np.trapz(np.abs(fwd-bwd), u))
+    A = float(r["A"]) if r["A"] is not None else float(_trapz(np.abs(fwd-bwd), u))
     tex = f"""
 % Auto-generated: T3 hysteresis loop
 \\begin{{figure}}[ht]
@@ -1,14 +1,14 @@
-import json, os, csv, argparse
-from glob import glob
+import os, csv, argparse
 from pathlib import Path
+from ogc.resultstore import load_runs
 
 def rows(root):
     out=[]
-    for p in sorted(glob(os.path.join(root, "t3", "*.json"))):
-        j=json.loads(Path(p).read_text(encoding="utf-8"))
-        prm, res = j.get("params", {}), j.get("result", {})
+    # results.sqlite im Ordner, sonst root/t3/*.json
+    for r in load_runs(root, "t3"):
+        prm, res = r["params"], r["result"]
         out.append({
-            "file": os.path.basename(p),
+            "file": r["run_id"],
             "seed": prm.get("seed"),
             "A_loop": res.get("A_loop"),
             "n_steps": prm.get("n_steps") or res.get("u_grid") and len(res["u_grid"]),
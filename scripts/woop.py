@@ -1,9 +1,9 @@
 
-import argparse, subprocess, sys, os, shlex, pathlib
+import argparse, sys, os, pathlib
+from ogc.pipeline import Pipeline
+from ogc.resultstore import ResultStore
 
-def run(cmd):
-    print(">>", cmd)
-    return subprocess.run(cmd, shell=True, check=True)
+HERE = os.path.dirname(os.path.abspath(__file__))
 
 def parse_seeds(spec: str):
     if "-" in spec:
@@ -11,6 +11,38 @@ def parse_seeds(spec: str):
         return list(range(int(a), int(b)+1))
     return [int(x) for x in spec.split(",") if x.strip()]
 
+def store_task(store_file, test, seeds, match, command, force):
+    """
+    (action, done) für einen Pipeline-Task, dessen Ausgabe Zeilen in einem gemeinsamen Store sind.
+    Fertig = genau eine Zeile pro Seed mit diesen Parametern (match: Filter wie ResultStore.query).
+    Vor dem Lauf werden alte Zeilen des Tasks gelöscht (--force: alle, sonst doppelte), damit
+    Neuberechnungen ersetzen statt anhängen; gerechnet werden nur die fehlenden Seeds.
+    """
+    def counts(st):
+        c = dict.fromkeys(seeds, 0)
+        for row in st.query(test, seed=seeds, full=False, **match):
+            c[row["seed"]] += 1
+        return c
+
+    def action():
+        with ResultStore(store_file) as st:
+            if force:
+                st.delete(test, seed=seeds, **match)
+            c = counts(st)
+            dup = [s for s in seeds if c[s] > 1]
+            if dup:
+                st.delete(test, seed=dup, **match)
+        todo = [s for s in seeds if c[s] != 1]
+        return command(todo) if todo else None
+
+    def done():
+        if not os.path.exists(store_file):
+            return False
+        with ResultStore(store_file) as st:
+            return all(v == 1 for v in counts(st).values())
+
+    return action, done
+
 def main():
     p = argparse.ArgumentParser(description="WOOP: one-loop pipeline for T2+T3")
     p.add_argument("--out-root", required=True, help="result\\vYYYY-MM-DD_name")
@@ -25,39 +57,65 @@ def main():
     p.add_argument("--t3-n", type=int, default=300)
     p.add_argument("--t3-noise", type=float, default=0.05)
     p.add_argument("--t3-seeds", default="0-9")
+    p.add_argument("--workers", type=int, default=0, help="CPU-Budget für parallele Tasks, 0 = alle Kerne")
+    p.add_argument("--force", action="store_true",
+                   help="alles neu rechnen (ersetzt die Zeilen dieser Parameter im Store)")
+    p.add_argument("--dry-run", action="store_true", help="nur anzeigen, welche Tasks laufen würden")
     args = p.parse_args()
 
     out = pathlib.Path(args.out_root)
-    # 1) T2 phase
-    out_phase = out / "phase"
-    out_phase.mkdir(parents=True, exist_ok=True)
-    for s in parse_seeds(args.seeds):
-        cmd = f'python -m ogc.cli --out-dir "{out_phase}" t2 --n {args.n} --n-null {args.n_null} --seed {s} --null-mode phase --band-min {args.band_min} --band-max {args.band_max} --nperseg {args.nperseg} --target-fs {args.target_fs} --mode {args.mode}'
-        run(cmd)
-
-    # 2) T2 both
-    out_both = out / "both"
-    out_both.mkdir(parents=True, exist_ok=True)
-    for s in parse_seeds(args.seeds):
-        cmd = f'python -m ogc.cli --out-dir "{out_both}" t2 --n {args.n} --n-null {args.n_null} --seed {s} --null-mode both --band-min {args.band_min} --band-max {args.band_max} --nperseg {args.nperseg} --target-fs {args.target_fs} --mode {args.mode}'
-        run(cmd)
-
-    # 3) Export T2
-    cmd_export_t2 = f'python scripts/t2_export.py --both "{out_both}/t2" --phase "{out_phase}/t2" --out-dir figure'
-    run(cmd_export_t2)
-
-    # 4) T3 minimal (using existing CLI flags)
-    out_t3 = out / "t3"
-    out_t3.mkdir(parents=True, exist_ok=True)
-    for s in parse_seeds(args.t3_seeds):
-        cmd = f'python -m ogc.cli --out-dir "{out}" t3 --n {args.t3_n} --u-min 0.5 --u-max 1.0 --noise {args.t3_noise} --seed {s}'
-        run(cmd)
-
-    # 5) Export T3
-    cmd_export_t3 = f'python scripts/t3_export.py --root "{out}" --out-fig figure/fig_T3_loop.png --out-tex figure/T3_figure_snippet.tex'
-    run(cmd_export_t3)
-
-    print("\n[WOOP] Done. Figures in ./figure and JSONs in", out)
+    out_all = out / "all"
+    py = [sys.executable, "-m", "ogc.cli"]
+    # Task-DAG: T2 als ein t2-batch-Task (ein Prozess-Pool für alle Seeds), T3 ein Task pro Seed,
+    # Exporte hängen nur an ihren eigenen Eingaben; erledigte Tasks (Fingerprint in
+    # out/pipeline_state.json, Zeilen im Store) werden beim nächsten Lauf übersprungen
+    pipe = Pipeline(out, cpu_budget=args.workers or None)
+    t3_seeds = parse_seeds(args.t3_seeds)
+    # T3 ist billig: bei mehr als einem Kern bleibt einer für die T3-Tasks frei
+    t2_workers = max(1, pipe.cpu_budget - (1 if t3_seeds and pipe.cpu_budget > 1 else 0))
+
+    # 1) T2: null-mode all = phase-only und konservativer both-Test in einem Lauf pro Seed
+    t2_args = ["--n", str(args.n), "--n-null", str(args.n_null), "--null-mode", "all",
+               "--band-min", str(args.band_min), "--band-max", str(args.band_max),
+               "--nperseg", str(args.nperseg), "--target-fs", str(args.target_fs), "--mode", args.mode]
+    t2_match = {"n": args.n, "n_null": args.n_null, "null_mode": "all", "band_min": args.band_min,
+                "band_max": args.band_max, "mode": args.mode,
+                # nperseg=0 steht aufgelöst in params, nur explizite Werte vergleichen
+                "params": {"target_fs": args.target_fs, **({"nperseg": args.nperseg} if args.nperseg else {})}}
+    action, done = store_task(
+        str(out_all / "results.sqlite"), "t2", parse_seeds(args.seeds), t2_match,
+        lambda todo: py + ["--out-dir", str(out_all), "t2-batch", "--seeds", ",".join(map(str, todo)),
+                           "--workers", str(t2_workers)] + t2_args,
+        args.force)
+    t2 = [pipe.add("t2-batch", action, cost=t2_workers, stage="t2", done=done,
+                   params={"seeds": parse_seeds(args.seeds), "args": t2_args})]
+
+    # 2) Export T2 (both-Sicht = p_final, phase-Sicht = p_phase), sobald alle T2-Seeds fertig sind
+    pipe.add("export:t2", [sys.executable, os.path.join(HERE, "t2_export.py"), "--all", str(out_all), "--out-dir", "figure"],
+             deps=t2, stage="export", outputs=["figure/fig_T2_hist_both.png", "figure/T2_figures_snippet.tex"])
+
+    # 3) T3 minimal (using existing CLI flags), läuft parallel zu T2
+    t3 = []
+    for s in t3_seeds:
+        t3_args = ["--n", str(args.t3_n), "--u-min", "0.5", "--u-max", "1.0", "--noise", str(args.t3_noise)]
+        action, done = store_task(
+            str(out / "results.sqlite"), "t3", [s],
+            {"n": args.t3_n, "params": {"u_min": 0.5, "u_max": 1.0, "noise": args.t3_noise}},
+            lambda todo, t3_args=t3_args: py + ["--out-dir", str(out), "t3", *t3_args, "--seed", str(todo[0])],
+            args.force)
+        t3.append(pipe.add(f"t3:s{s}", action, done=done, params={"seed": s, "args": t3_args}))
+
+    # 4) Export T3
+    pipe.add("export:t3", [sys.executable, os.path.join(HERE, "t3_export.py"), "--root", str(out),
+                           "--out-fig", "figure/fig_T3_loop.png", "--out-tex", "figure/T3_figure_snippet.tex"],
+             deps=t3, stage="export", outputs=["figure/fig_T3_loop.png", "figure/T3_figure_snippet.tex"])
+
+    ok = pipe.run(force=args.force, dry_run=args.dry_run)
+    print()
+    print(pipe.report())
+    if not ok:
+        sys.exit(f"[WOOP] Tasks fehlgeschlagen, Logs in {out / 'pipeline_logs'}; erneuter Aufruf setzt dort fort.")
+    print("\n[WOOP] Done. Figures in ./figure and results (results.sqlite) in", out)
 
 if __name__ == "__main__":
     main()
@@ -1,37 +1,120 @@
-import argparse, json, os, datetime
+import argparse, json, os
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache, partial
 import numpy as np
 from scipy.signal import resample_poly
-from ogc.t2_crosscoherence import coherence_band
+from ogc.nullstore import save_nulls, verify
+from ogc.resultstore import ResultStore, new_run_id, save_json, store_path
+from ogc.signal_io import DEFAULT_CHUNK, decimate_pair, iter_pair
+from ogc.t2_crosscoherence import _coherence_band_loop, coherence_band
 
 def _ensure_dir(p):
     os.makedirs(p, exist_ok=True)
 
-def _save_json(obj, out_dir, sub):
-    ts = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
-    folder = os.path.join(out_dir, sub)
-    _ensure_dir(folder)
-    path = os.path.join(folder, f"{ts}.json")
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(obj, f, ensure_ascii=False, indent=2)
-    print(f"[saved] {path}")
+def _save_result(obj, args, sub, suffix=None, store=None, nulls=None):
+    """
+    Lauf als Zeile in {out_dir}/results.sqlite anhängen; mit --json zusätzlich als
+    {out_dir}/{sub}/{run_id}.json (altes Layout). run_id ist kollisionsfrei, auch bei
+    parallelen Läufen in derselben Sekunde.
+    nulls (--save-nulls): Null-Stichproben als {out_dir}/nulls/{run_id}.npz, verlinkt über
+    result["nulls_file"], danach per nullstore.verify gegen die p des Laufs geprüft.
+    """
+    run_id = new_run_id(suffix)
+    if nulls is not None:
+        res = obj["result"]
+        stat = res["stat_bands"] if res.get("stat_bands") is not None else res["stat"]
+        res["nulls_file"] = save_nulls(args.out_dir, run_id, nulls, stat, dtype=args.save_nulls,
+                                       null_mode=res.get("null_mode"), mode=res.get("mode"))
+        res["nulls_dtype"] = args.save_nulls
+        # Rundreise: p aus dem Sidecar muss das p des Laufs exakt reproduzieren
+        bad = verify(res, root=args.out_dir)
+        if bad:
+            print(f"[warn] {res['nulls_file']} reproduziert {', '.join(bad)} nicht")
+    if store is None:
+        with ResultStore(store_path(args.out_dir)) as st:
+            st.append(sub, obj, tag=args.tag, run_id=run_id)
+    else:
+        store.append(sub, obj, tag=args.tag, run_id=run_id)
+    print(f"[saved] {store_path(args.out_dir)} {sub}/{run_id}")
+    if args.json:
+        print(f"[saved] {save_json(obj, args.out_dir, sub, run_id=run_id)}")
 
-# ----------------- T2 -----------------
-def cmd_t2(args):
-    # Synthese
-    n = args.n
-    T = 30.0
-    fs = n / T
-    t = np.linspace(0, T, n, endpoint=False)
+def _parse_seeds(spec):
+    """
+    "0-49" -> 0..49, "1,3,7" -> [1, 3, 7]; beides kombinierbar ("0-4,10").
+    """
+    seeds = []
+    for part in str(spec).split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            a, b = part.split("-", 1)
+            seeds.extend(range(int(a), int(b) + 1))
+        else:
+            seeds.append(int(part))
+    return seeds
 
-    rng = np.random.default_rng(args.seed)
-    x = np.sin(2*np.pi*0.8*t) + 0.5*np.sin(2*np.pi*2.0*t) + 0.05 * rng.normal(0, 1, n)
-    y = np.sin(2*np.pi*0.8*t + 0.6) + 0.30 * rng.normal(0, 1, n)
+def _parse_bands(spec):
+    """
+    Bänder als Datei (eine Zeile pro Band: "f1 f2", "f1,f2" oder "f1:f2"; # = Kommentar)
+    oder inline "0.7:0.9,0.78:0.82".
+    """
+    if os.path.isfile(spec):
+        with open(spec, "r", encoding="utf-8") as f:
+            lines = [l.split("#")[0].strip() for l in f]
+        entries = [l.replace(",", " ").replace(":", " ").split() for l in lines if l]
+    else:
+        entries = [e.split(":") for e in spec.split(",") if e.strip()]
+    return [(float(a), float(b)) for a, b in entries]
 
-    # Downsampling ~20 Hz
+# ----------------- T2 -----------------
+@lru_cache(maxsize=4)
+def _load_decimated(x_file, y_file, x_col, y_col, decim, dtype, raw_dtype, raw_columns, chunk):
+    """
+    Messdaten chunkweise lesen (memmap bzw. CSV-Blöcke) und dezimieren; die volle Rate liegt nie im RAM.
+    Gecacht, damit t2-batch die Dateien pro Prozess nur einmal liest.
+    """
+    pairs = iter_pair(x_file, y_file, x_col=x_col, y_col=y_col, chunk=chunk, dtype=dtype,
+                      raw_dtype=raw_dtype, raw_columns=raw_columns)
+    x_ds, y_ds, n = decimate_pair(pairs, decim, dtype=dtype)
+    x_ds.setflags(write=False)
+    y_ds.setflags(write=False)
+    return x_ds, y_ds, n
+
+def _t2_signals(args):
+    """
+    Eingaben für T2 aus args: Messdaten (--x-file) oder Synthese mit --seed, dezimiert auf ~target_fs,
+    dazu nperseg (0 => auto). Rückgabe dict(x, y, n, fs, fs_ds, target_fs, nperseg, dtype, x_file).
+    """
+    dtype = np.dtype(getattr(args, "dtype", "float64"))
     target_fs = 20.0 if args.target_fs is None else float(args.target_fs)
-    decim = max(1, int(round(fs / target_fs)))
-    x_ds = resample_poly(x, up=1, down=decim)
-    y_ds = resample_poly(y, up=1, down=decim)
+    x_file = getattr(args, "x_file", None)
+
+    if x_file:
+        # Messdaten: Dezimation ~20 Hz chunkweise, identisch zu resample_poly auf dem Ganzen
+        if not args.fs:
+            raise SystemExit("--fs (Abtastrate der Dateien) ist mit --x-file nötig")
+        fs = float(args.fs)
+        decim = max(1, int(round(fs / target_fs)))
+        x_ds, y_ds, n = _load_decimated(x_file, args.y_file, args.x_col, args.y_col, decim, dtype.name,
+                                        args.raw_dtype, args.raw_columns, args.chunk_size)
+    else:
+        # Synthese
+        n = args.n
+        T = 30.0
+        fs = n / T
+        t = np.linspace(0, T, n, endpoint=False, dtype=dtype)
+
+        # Rauschen aus demselben float64-Strom wie bisher, nur im Rechen-dtype abgelegt
+        rng = np.random.default_rng(args.seed)
+        x = np.sin(2*np.pi*0.8*t) + 0.5*np.sin(2*np.pi*2.0*t) + 0.05 * rng.normal(0, 1, n).astype(dtype)
+        y = np.sin(2*np.pi*0.8*t + 0.6) + 0.30 * rng.normal(0, 1, n).astype(dtype)
+
+        # Downsampling ~20 Hz
+        decim = max(1, int(round(fs / target_fs)))
+        x_ds = resample_poly(x, up=1, down=decim)
+        y_ds = resample_poly(y, up=1, down=decim)
     fs_ds = fs / decim
 
     # nperseg: 0 => auto
@@ -41,8 +124,16 @@ def cmd_t2(args):
         nperseg = max(128, L // 6)
     if nperseg % 2 == 1:
         nperseg += 1
+    return {"x": x_ds, "y": y_ds, "n": n, "fs": fs, "fs_ds": fs_ds, "target_fs": target_fs,
+            "nperseg": nperseg, "dtype": dtype, "x_file": x_file}
+
+def _t2_result(args):
+    sig = _t2_signals(args)
+    x_ds, y_ds, n, fs, fs_ds = sig["x"], sig["y"], sig["n"], sig["fs"], sig["fs_ds"]
+    target_fs, nperseg, dtype, x_file = sig["target_fs"], sig["nperseg"], sig["dtype"], sig["x_file"]
 
     band = (args.band_min, args.band_max)
+    bands = _parse_bands(args.bands) if args.bands else None
 
     res = coherence_band(
         x_ds, y_ds,
@@ -52,38 +143,160 @@ def cmd_t2(args):
         n_null=args.n_null,
         rng=args.seed,
         mode=args.mode,
-        null_mode=args.null_mode
+        null_mode=args.null_mode,
+        batch_size=args.batch_size,
+        workers=getattr(args, "null_workers", None),
+        seq_h=args.seq_h or None,
+        bands=bands,
+        fwer=args.fwer,
+        dtype=dtype,
+        keep_nulls=bool(getattr(args, "save_nulls", None) and args.out_dir)
     )
+    nulls = res.pop("nulls", None)
+    if bands is not None:
+        # --band-min/--band-max wurden ignoriert: nur die ausgewerteten Bänder ablegen,
+        # band_min/band_max (Indexspalten) = umschließendes Band der Liste
+        band = None
+        band_min, band_max = min(lo for lo, _ in bands), max(hi for _, hi in bands)
+    else:
+        band_min, band_max = band
 
     out = {
         "params": {
             "out_dir": args.out_dir,
-            "n": args.n,
+            "n": n,
             "n_null": args.n_null,
             "seed": args.seed,
             "null_mode": args.null_mode,
-            "band_min": args.band_min,
-            "band_max": args.band_max,
+            "band_min": band_min,
+            "band_max": band_max,
             "nperseg": nperseg,
             "target_fs": target_fs,
             "fs_ds": fs_ds,
-            "band": list(band)
+            "band": None if band is None else list(band),
+            "null_workers": getattr(args, "null_workers", None),
+            "batch_size": args.batch_size,
+            "seq_h": args.seq_h or None,
+            "bands": None if bands is None else [list(b) for b in bands],
+            "dtype": dtype.name,
+            "x_file": x_file,
+            "y_file": getattr(args, "y_file", None),
+            "fs": fs
         },
         "result": res
     }
+    if nulls is not None:
+        out["nulls"] = nulls
+    return out
+
+def cmd_t2(args):
+    out = _t2_result(args)
+    nulls = out.pop("nulls", None)
     print(json.dumps(out, ensure_ascii=False, indent=2))
     if args.out_dir:
-        _save_json(out, args.out_dir, "t2")
+        _save_result(out, args, "t2", nulls=nulls)
+
+def _t2_seed(args, seed):
+    a = argparse.Namespace(**vars(args))
+    a.seed = seed
+    return _t2_result(a)
+
+def cmd_t2_batch(args):
+    # mehrere Seeds in einem Prozess-Pool statt einem Interpreter-Start pro Seed
+    seeds = _parse_seeds(args.seeds)
+    workers = max(1, min(args.workers or os.cpu_count() or 1, len(seeds) or 1))
+    job = argparse.Namespace(**{k: v for k, v in vars(args).items() if k != "func"})
+    if workers == 1:
+        outs = map(partial(_t2_seed, job), seeds)
+        pool = None
+    else:
+        pool = ProcessPoolExecutor(max_workers=workers)
+        outs = pool.map(partial(_t2_seed, job), seeds)
+    # ein Store-Handle für alle Seeds; jede Zeile wird sofort (atomar) angehängt
+    store = ResultStore(store_path(args.out_dir)) if args.out_dir else None
+    try:
+        for seed, out in zip(seeds, outs):
+            res = out["result"]
+            nulls = out.pop("nulls", None)
+            print(f"[t2] seed={seed} stat={res['stat']:.6g} p_final={res['p_value_final']}")
+            if store is not None:
+                _save_result(out, args, "t2", suffix=f"s{seed}", store=store, nulls=nulls)
+    finally:
+        if store is not None:
+            store.close()
+        if pool is not None:
+            pool.shutdown()
+
+def _dtype_deviation(args, seeds, dtype):
+    """
+    Referenzvergleich: gleiche Seeds einmal in float64, einmal in dtype.
+    Maximale Abweichung von stat und p-Werten sowie Anzahl gekippter Entscheidungen (alpha 0.05).
+    """
+    keys = ("p_value_flip", "p_value_phase", "p_value_final")
+    dev = {"stat": 0.0, **{k: 0.0 for k in keys}}
+    flips = []
+    for seed in seeds:
+        res = {}
+        for dt in ("float64", dtype):
+            a = argparse.Namespace(**vars(args))
+            a.seed, a.dtype, a.save_nulls = seed, dt, None
+            res[dt] = _t2_result(a)["result"]
+        ref, cmp = res["float64"], res[dtype]
+        for k in dev:
+            if ref.get(k) is not None and cmp.get(k) is not None:
+                dev[k] = max(dev[k], abs(float(cmp[k]) - float(ref[k])))
+        if ref["decision_alpha_0.05"] != cmp["decision_alpha_0.05"]:
+            flips.append(seed)
+    return {"dtype": dtype, "seeds": list(seeds), "max_abs_dev": dev, "decision_flips": flips}
 
-# ----------------- T3 (unverändert) -----------------
+def cmd_t2_dtype_check(args):
+    out = {"params": {k: v for k, v in vars(args).items() if k != "func"},
+           "result": _dtype_deviation(args, _parse_seeds(args.seeds), args.dtype)}
+    print(json.dumps(out, ensure_ascii=False, indent=2))
+    if args.out_dir:
+        _save_result(out, args, "t2_dtype")
+
+def cmd_t2_loop_check(args):
+    """
+    Gebatchte Nulls gegen die ursprüngliche Einzelschleife: pro Seed und batch_size müssen
+    p_value_flip/phase/final exakt übereinstimmen (Exit-Code 1 bei Abweichung).
+    """
+    keys = ("p_value_flip", "p_value_phase", "p_value_final")
+    sizes = [int(b) for b in str(args.batch_sizes).split(",") if b.strip()]
+    bad = []
+    for seed in _parse_seeds(args.seeds):
+        a = argparse.Namespace(**vars(args))
+        a.seed, a.dtype, a.save_nulls, a.bands, a.seq_h = seed, "float64", None, None, 0
+        sig = _t2_signals(a)
+        ref = _coherence_band_loop(sig["x"], sig["y"], fs=sig["fs_ds"], band=(a.band_min, a.band_max),
+                                   nperseg=sig["nperseg"], n_null=a.n_null, rng=seed, mode=a.mode,
+                                   null_mode=a.null_mode)
+        for b in sizes:
+            a.batch_size = b
+            res = _t2_result(a)["result"]
+            diff = {k: (ref[k], res[k]) for k in keys if ref[k] != res[k]}
+            print(f"[t2-loop-check] seed={seed} batch_size={b} " + (f"ABWEICHUNG {diff}" if diff else "ok"))
+            if diff:
+                bad.append({"seed": seed, "batch_size": b, "diff": diff})
+    print(json.dumps({"checked": len(_parse_seeds(args.seeds)) * len(sizes), "mismatches": bad}, indent=2))
+    if bad:
+        raise SystemExit(1)
+
+# ----------------- T3 -----------------
 def cmd_t3(args):
     # einfache Demo-Ausgabe: dein vorhandener Hysterese-Code
-    from ogc.tests.t3_hysteresis import hysteresis_loop
-    res = hysteresis_loop(n=args.n, u_min=args.u_min, u_max=args.u_max, noise=args.noise, seed=args.seed)
-    out = {"params": {"n": args.n, "u_min": args.u_min, "u_max": args.u_max, "noise": args.noise, "seed": args.seed}, "result": res}
+    from ogc.t3_hysteresis import hysteresis_loop
+    params = {"n": args.n, "u_min": args.u_min, "u_max": args.u_max, "noise": args.noise, "seed": args.seed}
+    if args.n_null > 0:
+        # gleiche Kurven/A_loop, zusätzlich Surrogate-Test für A_loop
+        res = hysteresis_loop(**params, n_null=args.n_null, null=args.null, workers=args.workers)
+        params.update(n_null=args.n_null, null=args.null, workers=args.workers)
+    else:
+        res = hysteresis_loop(**params)
+    out = {"params": params, "result": res}
     print(json.dumps(out, ensure_ascii=False, indent=2))
     if args.out_dir:
-        _save_json(out, args.out_dir, "t3")
+        _save_result(out, args, "t3")
 
 # ----------------- S-Margin (unverändert) -----------------
 def cmd_s_margin(args):
@@ -92,7 +305,7 @@ def cmd_s_margin(args):
     out = {"params": {"loss": args.loss, "window": args.window}, "result": res}
     print(json.dumps(out, ensure_ascii=False, indent=2))
     if args.out_dir:
-        _save_json(out, args.out_dir, "s_margin")
+        _save_result(out, args, "s_margin")
 
 # ----------------- SPLIT (unverändert) -----------------
 def cmd_split(args):
@@ -103,7 +316,7 @@ def cmd_split(args):
     out = {"params": {"values_a": args.values_a, "values_b": args.values_b, "tol": args.tol}, "result": res}
     print(json.dumps(out, ensure_ascii=False, indent=2))
     if args.out_dir:
-        _save_json(out, args.out_dir, "split")
+        _save_result(out, args, "split")
 
 # ----------------- C* (unverändert) -----------------
 def cmd_cstar(args):
@@ -114,32 +327,123 @@ def cmd_cstar(args):
         for k in range(args.echo_every, args.n, args.echo_every):
             base[k:min(k+3, args.n)] += 0.3
         base = np.clip(base, 0, 1)
-    res = cstar_return_indicator(base, max_lag=args.max_lag, rng=args.seed)
-    out = {"params": {"n": args.n, "max_lag": args.max_lag, "inject_echo": args.inject_echo, "echo_every": args.echo_every, "seed": args.seed}, "result": res}
+    res = cstar_return_indicator(base, max_lag=args.max_lag, rng=args.seed, n_boot=args.n_boot)
+    out = {"params": {"n": args.n, "max_lag": args.max_lag, "inject_echo": args.inject_echo, "echo_every": args.echo_every, "seed": args.seed, "n_boot": args.n_boot}, "result": res}
     print(json.dumps(out, ensure_ascii=False, indent=2))
     if args.out_dir:
-        _save_json(out, args.out_dir, "cstar")
+        _save_result(out, args, "cstar")
+
+class _Tee:
+    # schreibt JSON-Zeilen gleichzeitig auf stdout und in die Ergebnisdatei
+    def __init__(self, *streams):
+        self.streams = streams
+    def write(self, s):
+        for f in self.streams:
+            f.write(s)
+    def flush(self):
+        for f in self.streams:
+            f.flush()
+
+def cmd_cstar_stream(args):
+    # laufender C*-Monitor: Zählwerte von stdin oder aus einer Datei, JSON-Zeilen auf stdout
+    import sys
+    from ogc.tests.cstar_longreturn import run_monitor
+    kwargs = dict(emit_every=args.emit_every, window=args.window, max_lag=args.max_lag, n_boot=args.n_boot,
+                  refresh_every=args.refresh_every, rng=args.seed, background=not args.sync)
+    src = sys.stdin if args.input == "-" else open(args.input, "r", encoding="utf-8")
+    try:
+        if args.out_dir:
+            folder = os.path.join(args.out_dir, "cstar_stream")
+            _ensure_dir(folder)
+            path = os.path.join(folder, new_run_id() + ".jsonl")
+            with open(path, "w", encoding="utf-8") as f:
+                run_monitor(src, out=_Tee(sys.stdout, f), **kwargs)
+            print(f"[saved] {path}", file=sys.stderr)
+        else:
+            run_monitor(src, out=sys.stdout, **kwargs)
+    finally:
+        if src is not sys.stdin:
+            src.close()
+
+def cmd_export_json(args):
+    # Store -> JSON-Dateien im alten Layout {out_dir}/{test}/{run_id}.json
+    if not os.path.exists(store_path(args.out_dir)):
+        raise SystemExit(f"kein Ergebnis-Store unter {store_path(args.out_dir)}")
+    with ResultStore(store_path(args.out_dir)) as store:
+        paths = store.export_json(args.dest or args.out_dir, test=args.test, tag=args.tag)
+    print(f"[export] {len(paths)} JSON-Dateien")
 
 # ----------------- MAIN -----------------
+def _add_t2_args(q):
+    q.add_argument("--n", type=int, default=12288)
+    q.add_argument("--n-null", type=int, default=2000)
+    q.add_argument("--mode", type=str, default="mean", choices=["mean", "peak"])
+    q.add_argument("--null-mode", type=str, default="both", choices=["flip", "phase", "both", "all"])
+    q.add_argument("--band-min", type=float, default=0.7)
+    q.add_argument("--band-max", type=float, default=0.9)
+    q.add_argument("--nperseg", type=int, default=0, help="0 = auto (≈ len/6), sonst fixer Wert")
+    q.add_argument("--target-fs", type=float, default=20.0, help="Downsample-Ziel (Hz)", dest="target_fs")
+    q.add_argument("--batch-size", type=int, default=256, help="Surrogates pro gebatchtem Welch/CSD-Aufruf")
+    q.add_argument("--seq-h", type=int, default=0,
+                   help="sequentielles MC (Besag–Clifford): Null stoppt nach h Überschreitungen, 0 = aus")
+    q.add_argument("--bands", type=str, default=None,
+                   help='mehrere Bänder aus einem Surrogate-Durchlauf: Datei oder inline "0.7:0.9,0.78:0.82" (ersetzt --band-min/--band-max)')
+    q.add_argument("--fwer", action="store_true", help="mit --bands: familienweiser max-Statistik-p zusätzlich")
+    q.add_argument("--save-nulls", type=str, default=None, choices=["float16", "float32", "float64"],
+                   help="mit --out-dir: Null-Stichproben als nulls/{run_id}.npz in diesem dtype ablegen "
+                        "(Neuberechnung von p-Werten/Quantilen über ogc.nullstore; float16 ist "
+                        "verlustbehaftet, p zum gespeicherten stat bleibt exakt)")
+    q.add_argument("--dtype", type=str, default="float64", choices=["float64", "float32"],
+                   help="Rechen-dtype für Synthese, Downsampling, Surrogates und Kohärenz (float32: FFT in complex64)")
+    # Messdaten statt Synthese: .npy, Rohbinär (memmap) oder CSV; eine Datei mit zwei Spalten oder x/y getrennt
+    q.add_argument("--x-file", type=str, default=None, help="x-Signal (oder zweispaltige Datei mit x und y)")
+    q.add_argument("--y-file", type=str, default=None, help="y-Signal; ohne: Spalte --y-col aus --x-file")
+    q.add_argument("--x-col", type=int, default=0)
+    q.add_argument("--y-col", type=int, default=None, help="Default: 1 bei einer Datei, 0 bei --y-file")
+    q.add_argument("--fs", type=float, default=None, help="Abtastrate der Dateien (Hz)")
+    q.add_argument("--raw-dtype", type=str, default="float64", help="Sample-Typ von Rohbinärdateien")
+    q.add_argument("--raw-columns", type=int, default=1, help="Kanäle (interleaved) in Rohbinärdateien")
+    q.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK, help="Samples pro Lese-/Dezimier-Chunk")
+
 def main():
     p = argparse.ArgumentParser()
-    p.add_argument("--out-dir", type=str, default=None, help="optional: Ergebnisse als JSON ablegen in diesem Ordner")
+    p.add_argument("--out-dir", type=str, default=None,
+                   help="optional: Ergebnisse in diesem Ordner ablegen (results.sqlite, eine Zeile pro Lauf)")
+    p.add_argument("--json", action="store_true", help="zusätzlich eine JSON-Datei pro Lauf ({out-dir}/{test}/)")
+    p.add_argument("--tag", type=str, default=None, help="Kennung der Läufe im Store (z.B. Kampagne)")
 
     sub = p.add_subparsers(dest="cmd", required=True)
 
     # T2
     p2 = sub.add_parser("t2")
-    p2.add_argument("--n", type=int, default=12288)
-    p2.add_argument("--n-null", type=int, default=2000)
+    _add_t2_args(p2)
     p2.add_argument("--seed", type=int, default=0)
-    p2.add_argument("--mode", type=str, default="mean", choices=["mean", "peak"])
-    p2.add_argument("--null-mode", type=str, default="both", choices=["flip", "phase", "both"])
-    p2.add_argument("--band-min", type=float, default=0.7)
-    p2.add_argument("--band-max", type=float, default=0.9)
-    p2.add_argument("--nperseg", type=int, default=0, help="0 = auto (≈ len/6), sonst fixer Wert")
-    p2.add_argument("--target-fs", type=float, default=20.0, help="Downsample-Ziel (Hz)", dest="target_fs")
+    p2.add_argument("--workers", type=int, default=None, dest="null_workers",
+                    help="Null-Verteilung auf Prozesse verteilen (SeedSequence pro Chunk, bitgleich für jede Worker-Zahl)")
     p2.set_defaults(func=cmd_t2)
 
+    # T2 über viele Seeds (Prozess-Pool), gleiche JSONs wie t2
+    p2b = sub.add_parser("t2-batch")
+    _add_t2_args(p2b)
+    p2b.add_argument("--seeds", type=str, default="0-49", help='z.B. "0-49" oder "1,3,7"')
+    p2b.add_argument("--workers", type=int, default=0, help="Prozesse, 0 = alle Kerne")
+    p2b.set_defaults(func=cmd_t2_batch)
+
+    # float32 gegen float64 auf einem Referenz-Satz von Seeds prüfen
+    p2d = sub.add_parser("t2-dtype-check")
+    _add_t2_args(p2d)
+    p2d.set_defaults(dtype="float32")
+    p2d.add_argument("--seeds", type=str, default="0-9", help='z.B. "0-9" oder "1,3,7"')
+    p2d.set_defaults(func=cmd_t2_dtype_check)
+
+    # gebatchte Nulls gegen die ursprüngliche Einzelschleife prüfen (p exakt gleich)
+    p2l = sub.add_parser("t2-loop-check")
+    _add_t2_args(p2l)
+    p2l.set_defaults(n=12288, n_null=300, band_min=0.1, band_max=5.0, nperseg=128)
+    p2l.add_argument("--seeds", type=str, default="0-9", help='z.B. "0-9" oder "1,3,7"')
+    p2l.add_argument("--batch-sizes", type=str, default="1,7,256", dest="batch_sizes")
+    p2l.set_defaults(func=cmd_t2_loop_check)
+
     # T3
     p3 = sub.add_parser("t3")
     p3.add_argument("--n", type=int, default=300)
@@ -147,6 +451,9 @@ def main():
     p3.add_argument("--u-max", type=float, default=2.0)
     p3.add_argument("--noise", type=float, default=0.0)
     p3.add_argument("--seed", type=int, default=0)
+    p3.add_argument("--n-null", type=int, default=0, help="Surrogates für p_value_A_loop, 0 = kein Test")
+    p3.add_argument("--null", choices=["phase", "shift"], default="phase")
+    p3.add_argument("--workers", type=int, default=None, help="Prozesse für die Surrogate-Blöcke")
     p3.set_defaults(func=cmd_t3)
 
     # Safety margin
@@ -169,9 +476,30 @@ def main():
     pc.add_argument("--inject-echo", action="store_true")
     pc.add_argument("--echo-every", type=int, default=240)
     pc.add_argument("--seed", type=int, default=0)
+    pc.add_argument("--n-boot", type=int, default=200, help="Block-Shuffle-Surrogates")
     pc.set_defaults(func=cmd_cstar)
 
+    # C* fortlaufend über ein gleitendes Fenster (stdin oder Datei)
+    pcs = sub.add_parser("cstar-stream")
+    pcs.add_argument("--input", type=str, default="-", help='Datei mit Zählwerten, "-" = stdin')
+    pcs.add_argument("--window", type=int, default=8000)
+    pcs.add_argument("--max-lag", type=int, default=400)
+    pcs.add_argument("--n-boot", type=int, default=200)
+    pcs.add_argument("--refresh-every", type=int, default=1000, help="Null alle k Samples neu (Hintergrund-Thread)")
+    pcs.add_argument("--emit-every", type=int, default=100, help="JSON-Datensatz alle k Samples")
+    pcs.add_argument("--seed", type=int, default=0)
+    pcs.add_argument("--sync", action="store_true", help="Null synchron rechnen (reproduzierbar)")
+    pcs.set_defaults(func=cmd_cstar_stream)
+
+    # Store-Inhalt als JSON-Dateien (Kompatibilität mit älteren Auswertungen)
+    pe = sub.add_parser("export-json")
+    pe.add_argument("--test", type=str, default=None, help="nur diesen Test (t2, t3, cstar, ...)")
+    pe.add_argument("--dest", type=str, default=None, help="Zielordner, Default: --out-dir")
+    pe.set_defaults(func=cmd_export_json)
+
     args = p.parse_args()
+    if args.cmd == "export-json" and not args.out_dir:
+        p.error("export-json braucht --out-dir")
     args.func(args)
 
 if __name__ == "__main__":
@@ -14,22 +14,137 @@ def shell_randomization(values, rng=None):
     values = np.asarray(values)
     return rng.permutation(values)
 
+def stratified_shell_randomization(values, strata, rng=None):
+    """
+    Permute values only within each stratum (e.g. radial shells), so per-stratum counts
+    and value multisets are preserved.
+    """
+    rng = np.random.default_rng(rng)
+    values = np.asarray(values)
+    return values[next(permutation_blocks(len(values), 1, rng=rng, strata=strata))[0]]
+
+# memory budget for one block of permutation indices and permuted values (bytes)
+PERM_MEM_BYTES = 64 * 2**20
+
+# relative tolerance for ties in permutation_test: the statistic of a permuted block is summed
+# in a different order than the observed one, so an unchanged value can differ in the last bits
+PERM_RTOL = 1e-9
+
+def permutation_blocks(n, n_perm, rng=None, strata=None, mem_bytes=PERM_MEM_BYTES):
+    """
+    Yield (rows, n) permutation index blocks, n_perm rows in total, rows sized to mem_bytes.
+    Without strata one Generator.permuted call per block; with strata (labels of length n)
+    an argsort of random keys offset by stratum code, so indices only move within a stratum.
+    """
+    rng = np.random.default_rng(rng)
+    n, n_perm = int(n), int(n_perm)
+    step = max(1, int(mem_bytes // max(16 * n, 1)))
+    if strata is not None:
+        codes = np.unique(np.asarray(strata), return_inverse=True)[1].ravel()
+        base = np.argsort(codes, kind="stable")          # positions grouped by stratum
+        offset = codes[base].astype(float)
+    for lo in range(0, n_perm, step):
+        rows = min(step, n_perm - lo)
+        if strata is None:
+            yield rng.permuted(np.tile(np.arange(n), (rows, 1)), axis=1)
+            continue
+        # stratum order is kept by the integer offset, the order within a stratum is random
+        order = np.argsort(offset + rng.random((rows, n)), axis=1)
+        perm = np.empty((rows, n), dtype=np.int64)
+        perm[:, base] = base[order]
+        yield perm
+
+def group_mean_diff(labels, a=1, b=0):
+    """
+    Statistic for permutation_test: mean(x[labels == a]) - mean(x[labels == b]),
+    evaluated for a whole (rows, n) block with one matrix-vector product.
+    """
+    labels = np.asarray(labels)
+    ia, ib = labels == a, labels == b
+    w = ia / max(ia.sum(), 1) - ib / max(ib.sum(), 1)
+    return lambda X: X @ w
+
+def shell_sums(shells):
+    """
+    Statistic for permutation_test: sum of x per shell, (rows, n_shells) per block
+    (one-hot matrix product); shells are the sorted unique shell labels.
+    """
+    inv = np.unique(np.asarray(shells), return_inverse=True)[1].ravel()
+    onehot = np.zeros((inv.size, inv.max() + 1 if inv.size else 0))
+    onehot[np.arange(inv.size), inv] = 1.0
+    return lambda X: X @ onehot
+
+def permutation_test(x, statistic, n_perm=1000, rng=None, strata=None, alternative="greater",
+                     mem_bytes=PERM_MEM_BYTES, return_null=False, rtol=PERM_RTOL):
+    """
+    Vectorized permutation test: x is permuted n_perm times (within strata, if given) in
+    (rows, n) blocks and statistic is evaluated once per block.
+
+    statistic maps a (rows, n) array to (rows,) or (rows, k), e.g. group_mean_diff(labels)
+    or shell_sums(shells); k statistics get k p-values.
+    p = fraction of permutations with null >= stat ("greater"), <= stat ("less") or
+    |null - mean(null)| >= |stat - mean(null)| ("two-sided"). Values within rtol * |stat|
+    count as ties (as >=), so a statistic the permutation cannot change gives p = 1.
+    Returns dict(stat, p_value, n_perm, null_mean, null_std, null_q025, null_q50, null_q975[, null]).
+    """
+    if alternative not in ("greater", "less", "two-sided"):
+        raise ValueError('alternative must be "greater", "less" or "two-sided"')
+    x = np.asarray(x)
+    stat = np.asarray(statistic(x[None, :]), dtype=float)[0]
+    parts = [np.asarray(statistic(x[idx]), dtype=float)
+             for idx in permutation_blocks(x.shape[0], n_perm, rng=rng, strata=strata, mem_bytes=mem_bytes)]
+    null = np.concatenate(parts) if parts else np.empty((0,) + stat.shape)
+    tol = rtol * np.abs(stat)
+    if alternative == "greater":
+        p = (null >= stat - tol).mean(axis=0)
+    elif alternative == "less":
+        p = (null <= stat + tol).mean(axis=0)
+    else:
+        c = null.mean(axis=0)
+        p = (np.abs(null - c) >= np.abs(stat - c) - tol).mean(axis=0)
+
+    def _out(v):
+        return float(v) if np.ndim(v) == 0 else np.asarray(v)
+
+    q = np.quantile(null, [0.025, 0.5, 0.975], axis=0) if null.shape[0] else np.full((3,) + stat.shape, np.nan)
+    res = {
+        "stat": _out(stat),
+        "p_value": _out(p),
+        "n_perm": int(null.shape[0]),
+        "null_mean": _out(null.mean(axis=0)),
+        "null_std": _out(null.std(axis=0)),
+        "null_q025": _out(q[0]),
+        "null_q50": _out(q[1]),
+        "null_q975": _out(q[2]),
+    }
+    if return_null:
+        res["null"] = null
+    return res
+
 def phase_only_surrogate(x, rng=None):
     """
     Real-valued 1D signal -> phase-randomized surrogate with amplitude preserved.
     """
+    return phase_only_surrogates(x, 1, rng=rng)[0]
+
+def phase_only_surrogates(x, n_surr, rng=None):
+    """
+    Batched phase_only_surrogate: (n_surr, n) surrogates of a real 1D signal.
+    One rfft of x, one (n_surr, n//2+1) phase draw and one batched irfft;
+    the draws match n_surr consecutive phase_only_surrogate calls on the same rng.
+    """
     rng = np.random.default_rng(rng)
     x = np.asarray(x)
     X = np.fft.rfft(x)
     amp = np.abs(X)
     phase = np.angle(X)
-    rand_phase = rng.uniform(0, 2*np.pi, size=phase.shape)
+    rand_phase = rng.uniform(0, 2*np.pi, size=(n_surr,) + phase.shape)
     # keep DC and (if exists) Nyquist phases
-    rand_phase[0] = phase[0]
+    rand_phase[:, 0] = phase[0]
     if (x.shape[0] % 2) == 0:
-        rand_phase[-1] = phase[-1]
+        rand_phase[:, -1] = phase[-1]
     Y = amp * np.exp(1j * rand_phase)
-    y = np.fft.irfft(Y, n=x.shape[0])
+    y = np.fft.irfft(Y, n=x.shape[0], axis=-1)
     return y
 
 def degree_preserving_rewire(adj, n_swap=1000, rng=None):
@@ -61,3 +176,172 @@ def degree_preserving_rewire(adj, n_swap=1000, rng=None):
         edges[i1] = [min(a,d), max(a,d)]
         edges[i2] = [min(c,b), max(c,b)]
     return A
+
+class _EdgeHash:
+    """
+    Open-addressing hash set of int64 edge keys (u * n + v, u < v) with vectorized
+    lookup/insert/delete. Linear probing, load factor <= 0.5, tombstones on delete.
+    """
+    EMPTY, TOMB = -1, -2
+
+    def __init__(self, keys):
+        keys = np.asarray(keys, dtype=np.int64)
+        cap = 1 << max(4, int(2 * max(len(keys), 1) - 1).bit_length())
+        self.slots = np.full(cap, self.EMPTY, dtype=np.int64)
+        self.mask = cap - 1
+        self.n_tomb = 0
+        self.insert(keys)
+
+    def _hash(self, keys):
+        # multiplicative (Fibonacci) hashing, then mask
+        h = (keys.astype(np.uint64) * np.uint64(0x9E3779B97F4A7C15)) >> np.uint64(17)
+        return (h & np.uint64(self.mask)).astype(np.int64)
+
+    def _find(self, keys):
+        # slot of each key, -1 if absent
+        pos = self._hash(keys)
+        out = np.full(len(keys), -1, dtype=np.int64)
+        todo = np.arange(len(keys))
+        while todo.size:
+            s = self.slots[pos[todo]]
+            hit = s == keys[todo]
+            out[todo[hit]] = pos[todo[hit]]
+            todo = todo[~hit & (s != self.EMPTY)]
+            pos[todo] = (pos[todo] + 1) & self.mask
+        return out
+
+    def contains(self, keys):
+        return self._find(np.asarray(keys, dtype=np.int64)) >= 0
+
+    def insert(self, keys):
+        """
+        Insert keys known to be absent and pairwise distinct.
+        """
+        pos = self._hash(keys)
+        todo = np.arange(len(keys))
+        claim = np.empty(len(self.slots), dtype=np.int64)
+        while todo.size:
+            p = pos[todo]
+            free = self.slots[p] < 0
+            # several keys probing the same free slot: exactly one of them takes it
+            cand, pc = todo[free], p[free]
+            claim[pc] = cand
+            won = claim[pc] == cand
+            self.n_tomb -= int((self.slots[pc[won]] == self.TOMB).sum())
+            self.slots[pc[won]] = keys[cand[won]]
+            left = np.ones(todo.size, dtype=bool)
+            left[np.flatnonzero(free)[won]] = False
+            todo = todo[left]
+            pos[todo] = (pos[todo] + 1) & self.mask
+
+    def delete(self, keys):
+        """
+        Delete keys known to be present.
+        """
+        self.slots[self._find(keys)] = self.TOMB
+        self.n_tomb += len(keys)
+        if self.n_tomb > len(self.slots) // 4:
+            live = self.slots[self.slots >= 0]
+            self.slots[:] = self.EMPTY
+            self.n_tomb = 0
+            self.insert(live)
+
+def _as_edges(graph, n_nodes=None):
+    """
+    Edge list (m, 2) with u < v, no self-loops or duplicates, plus node count.
+    Accepts an (m, 2) array/list or a scipy.sparse (symmetric or upper-triangular) matrix.
+    """
+    if hasattr(graph, "tocoo"):
+        coo = graph.tocoo()
+        e = np.stack([coo.row, coo.col], axis=1)[coo.data != 0]
+        n_nodes = graph.shape[0] if n_nodes is None else n_nodes
+    else:
+        e = np.asarray(graph, dtype=np.int64).reshape(-1, 2)
+    e = np.sort(e.astype(np.int64), axis=1)
+    e = e[e[:, 0] != e[:, 1]]
+    if n_nodes is None:
+        n_nodes = int(e.max()) + 1 if e.size else 0
+    # dedupe on edge keys u * n + v (much faster than unique(axis=0))
+    keys = np.unique(e[:, 0] * int(n_nodes) + e[:, 1])
+    return np.stack([keys // n_nodes, keys % n_nodes], axis=1), int(n_nodes)
+
+def degree_preserving_rewire_sparse(graph, n_swap=1000, rng=None, batch_size=None, n_nodes=None):
+    """
+    Maslov-Sneppen rewiring on an edge list or scipy.sparse matrix (undirected, binary).
+
+    Same move as degree_preserving_rewire ((a,b),(c,d) -> (a,d),(c,b), rejected on shared
+    nodes or existing edges), but without a dense matrix: existing edges live in an
+    open-addressing hash set (O(1) checks), swaps are proposed in vectorized batches
+    of batch_size and conflicts inside a batch (same edge used twice, same new edge
+    created twice) are resolved in bulk: each contested edge has one owning proposal,
+    the others are rejected like any other failed proposal.
+    n_swap counts proposals, as in the loop version. Degrees are preserved exactly.
+
+    Returns the rewired graph in the input form: (m, 2) edge array or a symmetric
+    scipy.sparse CSR matrix.
+    """
+    rng = np.random.default_rng(rng)
+    edges, n = _as_edges(graph, n_nodes)
+    m = edges.shape[0]
+    if m >= 2 and n_swap > 0:
+        K = int(batch_size) if batch_size else max(1, min(int(n_swap), m // 10))
+
+        def key(u, v):
+            return np.minimum(u, v) * n + np.maximum(u, v)
+
+        table = _EdgeHash(edges[:, 0] * n + edges[:, 1])
+        owner = np.empty(m, dtype=np.int64)
+        done = 0
+        while done < n_swap:
+            k = min(K, int(n_swap) - done)
+            done += k
+            i1, i2 = rng.integers(0, m, size=(2, k))
+            a, b = edges[i1, 0], edges[i1, 1]
+            c, d = edges[i2, 0], edges[i2, 1]
+            new1, new2 = key(a, d), key(c, b)
+            ok = ((a != c) & (a != d) & (b != c) & (b != d)
+                  & ~table.contains(new1) & ~table.contains(new2) & (new1 != new2))
+            # bulk conflict resolution: every edge slot and every new key gets exactly one
+            # owner among the proposals claiming it; a swap survives only if it owns all four
+            prop = np.flatnonzero(ok)
+            owner[i1[prop]] = prop
+            owner[i2[prop]] = prop
+            ok[prop[(owner[i1[prop]] != prop) | (owner[i2[prop]] != prop)]] = False
+            prop = np.flatnonzero(ok)
+            claims = np.concatenate([new1[prop], new2[prop]])
+            first = np.zeros(claims.size, dtype=bool)
+            first[np.unique(claims, return_index=True)[1]] = True
+            ok[prop[~first.reshape(2, -1).all(axis=0)]] = False
+            prop = np.flatnonzero(ok)
+            if not prop.size:
+                continue
+            table.delete(np.concatenate([key(a[prop], b[prop]), key(c[prop], d[prop])]))
+            table.insert(np.concatenate([new1[prop], new2[prop]]))
+            edges[i1[prop]] = np.stack([np.minimum(a[prop], d[prop]), np.maximum(a[prop], d[prop])], axis=1)
+            edges[i2[prop]] = np.stack([np.minimum(c[prop], b[prop]), np.maximum(c[prop], b[prop])], axis=1)
+    if hasattr(graph, "tocoo"):
+        from scipy import sparse
+        A = sparse.coo_matrix((np.ones(m), (edges[:, 0], edges[:, 1])), shape=(n, n))
+        return (A + A.T).tocsr()
+    return edges
+
+def _rewire_job(graph, n_swap, seed_seq, batch_size, n_nodes):
+    return degree_preserving_rewire_sparse(graph, n_swap=n_swap, rng=np.random.default_rng(seed_seq),
+                                           batch_size=batch_size, n_nodes=n_nodes)
+
+def degree_preserving_nulls(graph, n_graphs, n_swap=1000, rng=None, workers=None, batch_size=None):
+    """
+    n_graphs independent rewired null graphs (degree_preserving_rewire_sparse).
+    Graph j uses SeedSequence(rng).spawn(n_graphs)[j], so the nulls do not depend on
+    workers; workers > 1 builds them in a process pool.
+    """
+    ss = rng if isinstance(rng, np.random.SeedSequence) else np.random.default_rng(rng).bit_generator.seed_seq
+    children = np.random.SeedSequence(ss.entropy, spawn_key=ss.spawn_key).spawn(int(n_graphs))
+    edges, n = _as_edges(graph)
+    base = graph if hasattr(graph, "tocoo") else edges
+    if workers is None or int(workers) <= 1:
+        return [_rewire_job(base, n_swap, c, batch_size, n) for c in children]
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=int(workers)) as pool:
+        return list(pool.map(_rewire_job, [base] * len(children), [n_swap] * len(children), children,
+                             [batch_size] * len(children), [n] * len(children)))
@@ -0,0 +1,173 @@
+import os
+
+import numpy as np
+
+# Unterordner unter --out-dir für die Null-Sidecars ({run_id}.npz)
+NULLS_DIR = "nulls"
+KINDS = ("flip", "phase")
+
+def save_nulls(out_dir, run_id, nulls, stat, dtype="float32", null_mode=None, mode=None):
+    """
+    Null-Stichproben eines Laufs kompakt als {out_dir}/nulls/{run_id}.npz ablegen
+    (unkomprimiertes npz = ein .npy pro Null, Reihenfolge wie gezogen).
+    nulls: {"flip": (n,) oder (n, n_bands), "phase": ...}; stat: beobachtete Statistik (float64).
+    Gespeichert wird null - stat: die volle relative Genauigkeit des dtype liegt damit an der
+    Entscheidungsgrenze (Kohärenzen nahe 1 hätten in float16 sonst nur einen Abstand von 2**-11).
+    Differenzen, die im dtype zu 0 bzw. -0 würden, werden vom Nullpunkt weg auf den kleinsten
+    Subnormalwert gerundet: das Vorzeichen, also null >= stat, bleibt exakt, und p zum
+    gespeicherten stat reproduziert das p des Laufs. float16/float32 sind sonst verlustbehaftet
+    (Quantile und p zu einem anderen stat nur auf ~3 bzw. ~7 Stellen); Default float32.
+    Rückgabe: Pfad relativ zu out_dir (für result["nulls_file"]).
+    """
+    dtype = np.dtype(dtype)
+    if dtype not in (np.float16, np.float32, np.float64):
+        raise ValueError("dtype muss float16, float32 oder float64 sein")
+    stat = np.asarray(stat, dtype=np.float64)
+    arrays = {}
+    for k, v in nulls.items():
+        if v is None:
+            continue
+        d = np.asarray(v, dtype=np.float64) - stat
+        q = d.astype(dtype)
+        lost = (q == 0) & (d != 0)
+        q[lost] = np.copysign(np.finfo(dtype).smallest_subnormal, d[lost]).astype(dtype)
+        arrays[k] = q
+    arrays["stat"] = stat
+    if null_mode is not None:
+        arrays["null_mode"] = np.array(null_mode)
+    if mode is not None:
+        arrays["mode"] = np.array(mode)
+    rel = os.path.join(NULLS_DIR, f"{run_id}.npz")
+    path = os.path.join(out_dir, rel)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        np.savez(f, **arrays)
+    os.replace(tmp, path)
+    return rel
+
+def load_nulls(path, root=None):
+    """
+    Sidecar laden -> dict(flip, phase (float64 oder None), stat, null_mode, mode, diff).
+    diff: die gespeicherten Differenzen null - stat pro Null (vorzeichenexakt, siehe save_nulls);
+    flip/phase = diff + stat.
+    path relativ (wie in result["nulls_file"]) zusammen mit root = --out-dir des Laufs.
+    """
+    if root is not None and not os.path.isabs(path):
+        path = os.path.join(root, path)
+    with np.load(path, allow_pickle=False) as z:
+        st = z["stat"]
+        diff = {k: (z[k].astype(np.float64) if k in z.files else None) for k in KINDS}
+        out = {k: (None if diff[k] is None else diff[k] + st) for k in KINDS}
+        out["diff"] = diff
+        out["stat"] = float(st) if st.ndim == 0 else st
+        out["null_mode"] = str(z["null_mode"]) if "null_mode" in z.files else None
+        out["mode"] = str(z["mode"]) if "mode" in z.files else None
+    return out
+
+def p_value(nulls, stat, mid=False, plus_one=False):
+    """
+    Einseitiges p (nulls >= stat) pro Spalte.
+      mid=True:      mid-p, Bindungen zählen halb: P(null > stat) + 0.5 P(null == stat)
+      plus_one=True: (1 + #exc) / (1 + n) (Davison & Hinkley), nie 0
+    Für das p des Laufs selbst recompute() ohne stat benutzen (rechnet auf den Differenzen).
+    """
+    nulls = np.asarray(nulls, dtype=np.float64)
+    stat = np.asarray(stat, dtype=np.float64)
+    n = nulls.shape[0]
+    if n == 0:
+        return None
+    exc = (nulls > stat).sum(axis=0) + (0.5 if mid else 1.0) * (nulls == stat).sum(axis=0)
+    p = (exc + 1.0) / (n + 1.0) if plus_one else exc / n
+    return float(p) if np.ndim(p) == 0 else p
+
+def combine_p(p_values, method="max"):
+    """
+    Konservative Kombination mehrerer p (gleiche Hypothese, verschiedene Nulls):
+      "max":        max(p) wie p_value_final (gilt, wenn jeder Null für sich gültig ist)
+      "bonferroni": min(1, k * min(p))
+    """
+    vals = [np.asarray(p, dtype=np.float64) for p in p_values if p is not None]
+    if not vals:
+        return None
+    if method == "max":
+        p = np.maximum.reduce(vals)
+    elif method == "bonferroni":
+        p = np.minimum(1.0, len(vals) * np.minimum.reduce(vals))
+    else:
+        raise ValueError('method muss "max" oder "bonferroni" sein')
+    return float(p) if p.ndim == 0 else p
+
+def pool_nulls(*nulls):
+    """
+    Separat gerechnete Null-Stichproben desselben Nulls (z.B. zwei Läufe mit
+    unabhängigen Seeds) zu einer größeren Stichprobe zusammenlegen.
+    """
+    parts = [np.asarray(v, dtype=np.float64) for v in nulls if v is not None]
+    return np.concatenate(parts) if parts else None
+
+def tail_quantiles(nulls, q=(0.9, 0.95, 0.99)):
+    """
+    Obere Quantile der Null (kritische Werte zu alpha = 1 - q), pro Spalte.
+    """
+    nulls = np.asarray(nulls, dtype=np.float64)
+    if nulls.shape[0] == 0:
+        return None
+    return {float(qq): (float(v) if np.ndim(v) == 0 else v)
+            for qq, v in zip(q, np.quantile(nulls, q, axis=0))}
+
+def recompute(nullset, stat=None, alpha=0.05, mid=False, plus_one=False, null_mode=None,
+              method="max", q=(0.95, 0.99)):
+    """
+    p-Werte, Entscheidung und kritische Werte eines gespeicherten Laufs neu, ohne Signale:
+    recompute(load_nulls(run["result"]["nulls_file"], root=out_dir), alpha=0.01, mid=True).
+    null_mode (Default: wie gespeichert) wählt die Nulls für p_value_final wie in coherence_band.
+    Ohne stat zählen die gespeicherten Differenzen (null - stat >= 0): p ist dann in jedem dtype
+    identisch zum p des Laufs; mit anderem stat gilt die Genauigkeit des dtype.
+    """
+    diff = nullset.get("diff") if stat is None else None
+    stat = nullset["stat"] if stat is None else stat
+
+    def _p(k):
+        if nullset.get(k) is None:
+            return None
+        if diff is not None and diff.get(k) is not None:
+            return p_value(diff[k], np.zeros(np.shape(stat)), mid=mid, plus_one=plus_one)
+        return p_value(nullset[k], stat, mid=mid, plus_one=plus_one)
+
+    null_mode = null_mode or nullset.get("null_mode") or "both"
+    p = {k: _p(k) for k in KINDS}
+    used = [k for k in KINDS if null_mode in (k, "both", "all")]
+    p_final = combine_p([p[k] for k in used], method=method)
+    out = {
+        "stat": stat,
+        "null_mode": null_mode,
+        "p_value_flip": p["flip"],
+        "p_value_phase": p["phase"],
+        "p_value_final": p_final,
+        f"decision_alpha_{alpha}": None if p_final is None else (
+            bool(p_final < alpha) if np.ndim(p_final) == 0 else (p_final < alpha).tolist()),
+    }
+    for k in KINDS:
+        if nullset.get(k) is not None:
+            out[f"n_{k}"] = int(nullset[k].shape[0])
+            out[f"quantiles_{k}"] = tail_quantiles(nullset[k], q)
+    return out
+
+def verify(result, root=None):
+    """
+    Rundreise save -> load -> p prüfen: p-Werte aus dem Sidecar von result (result["nulls_file"],
+    relativ zu root) mit den gespeicherten p des Laufs vergleichen (bei --bands die *_bands).
+    Rückgabe: Liste abweichender Schlüssel, leer = exakt gleich.
+    """
+    rc = recompute(load_nulls(result["nulls_file"], root=root))
+    suffix = "_bands" if result.get("stat_bands") is not None else ""
+    bad = []
+    for key in ("p_value_flip", "p_value_phase", "p_value_final"):
+        want, got = result.get(key + suffix), rc[key]
+        if want is None and got is None:
+            continue
+        if want is None or got is None or not np.array_equal(np.asarray(want, dtype=np.float64),
+                                                              np.asarray(got, dtype=np.float64)):
+            bad.append(key + suffix)
+    return bad
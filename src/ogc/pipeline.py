@@ -0,0 +1,207 @@
+import hashlib
+import json
+import os
+import subprocess
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# Zustand unter state_dir: Fingerprints erledigter Tasks und ein Log pro Task
+STATE_FILE = "pipeline_state.json"
+LOG_DIR = "pipeline_logs"
+
+class Pipeline:
+    """
+    Task-DAG mit CPU-Budget und Wiederaufnahme.
+
+    Ein Task ist ein Kommando (Liste -> subprocess ohne Shell, str -> mit Shell) oder ein
+    Callable (gibt es ein Kommando zurück, wird dieses wie oben ausgeführt, z.B. nur für die
+    noch fehlenden Seeds), mit Abhängigkeiten, Kosten in Kernen (cost) und einer Stufe (stage, für den
+    Bericht). Bereite Tasks laufen parallel, solange die Summe ihrer Kosten cpu_budget nicht
+    übersteigt; ein Task wird gestartet, sobald alle seine Abhängigkeiten fertig sind
+    (Exporte also direkt nach ihren Eingaben, nicht erst am Ende).
+
+    Fingerprint = Hash aus Kommando/params und den Fingerprints der Abhängigkeiten. Erledigte
+    Tasks stehen mit ihrem Fingerprint in {state_dir}/pipeline_state.json (nach jedem Task
+    atomar geschrieben); beim nächsten Lauf werden sie übersprungen, wenn der Fingerprint
+    gleich ist, alle outputs existieren, done() (falls angegeben, z.B. Abfrage im Store)
+    True liefert und keine Abhängigkeit in diesem Lauf neu gerechnet wurde. Geänderte Parameter oder neu gerechnete Eingaben machen damit genau die
+    betroffenen Tasks und ihre Nachfolger ungültig.
+    Schlägt ein Task fehl, laufen unabhängige Tasks weiter, Nachfolger werden blockiert.
+    """
+
+    def __init__(self, state_dir, cpu_budget=None):
+        self.state_dir = str(state_dir)
+        self.cpu_budget = max(1, int(cpu_budget or os.cpu_count() or 1))
+        self.tasks = {}
+        self.status = {}
+        self.timing = {}
+        self.wall = 0.0
+
+    def add(self, name, action, deps=(), cost=1, stage=None, params=None, outputs=(), done=None):
+        """
+        Task anlegen; Rückgabe name (für deps späterer Tasks).
+        params: zusätzliche Werte für den Fingerprint (v.a. bei Callables);
+        outputs: Pfade, die nach dem Task existieren müssen, damit er übersprungen werden darf;
+        done: Callable ohne Argumente, True = Ergebnis vollständig vorhanden (für Ausgaben, die
+        keine eigene Datei sind, z.B. Zeilen in einem gemeinsamen results.sqlite).
+        """
+        if name in self.tasks:
+            raise ValueError(f"Task {name!r} existiert schon")
+        for d in deps:
+            if d not in self.tasks:
+                raise ValueError(f"{name}: unbekannte Abhängigkeit {d!r}")
+        self.tasks[name] = {
+            "action": action, "deps": list(deps), "cost": max(1, int(cost)),
+            "stage": stage or name.split(":")[0], "params": params, "outputs": [str(o) for o in outputs],
+            "done": done,
+        }
+        return name
+
+    # ---------- Zustand ----------
+    def _state_path(self):
+        return os.path.join(self.state_dir, STATE_FILE)
+
+    def _load_state(self):
+        try:
+            with open(self._state_path(), "r", encoding="utf-8") as f:
+                return json.load(f).get("tasks", {})
+        except (OSError, ValueError):
+            return {}
+
+    def _save_state(self, state):
+        os.makedirs(self.state_dir, exist_ok=True)
+        tmp = f"{self._state_path()}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"tasks": state}, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, self._state_path())
+
+    def _fingerprint(self, name, fps):
+        t = self.tasks[name]
+        action = t["action"]
+        what = action if isinstance(action, (str, list, tuple)) else \
+            f"{getattr(action, '__module__', '')}.{getattr(action, '__qualname__', repr(action))}"
+        blob = json.dumps({"action": what, "params": t["params"], "deps": [fps[d] for d in t["deps"]]},
+                          sort_keys=True, default=str)
+        return hashlib.sha256(blob.encode("utf-8")).hexdigest()[:20]
+
+    # ---------- Ausführung ----------
+    def _execute(self, name):
+        t = self.tasks[name]
+        action = t["action"]
+        t0 = time.perf_counter()
+        if callable(action):
+            action = action()
+        if action is not None:
+            os.makedirs(os.path.join(self.state_dir, LOG_DIR), exist_ok=True)
+            log = os.path.join(self.state_dir, LOG_DIR, name.replace(":", "_").replace("/", "_") + ".log")
+            with open(log, "w", encoding="utf-8") as f:
+                rc = subprocess.run(action, shell=isinstance(action, str), stdout=f, stderr=subprocess.STDOUT).returncode
+            if rc != 0:
+                with open(log, "r", encoding="utf-8", errors="replace") as f:
+                    tail = "".join(f.readlines()[-15:])
+                raise RuntimeError(f"exit {rc}, Log: {log}\n{tail}")
+        return t0, time.perf_counter()
+
+    def run(self, force=False, dry_run=False, verbose=True):
+        """
+        Alle Tasks ausführen bzw. überspringen. force=True ignoriert den gespeicherten Zustand.
+        dry_run=True zeigt nur, was laufen würde (Status "would_run", Nachfolger entsprechend).
+        Rückgabe: True, wenn kein Task fehlgeschlagen ist.
+        """
+        state = {} if force else self._load_state()
+        fps, pending, running, used = {}, list(self.tasks), {}, 0
+        self.status, self.timing = {}, {}
+        log = print if verbose else (lambda *a, **k: None)
+        t_start = time.perf_counter()
+
+        def schedule():
+            nonlocal used
+            changed = True
+            while changed:
+                changed = False
+                for name in list(pending):
+                    t = self.tasks[name]
+                    deps = [self.status.get(d) for d in t["deps"]]
+                    if any(s in ("failed", "blocked") for s in deps):
+                        self.status[name] = "blocked"
+                        pending.remove(name)
+                        changed = True
+                        log(f"[blocked] {name}")
+                        continue
+                    if not all(s in ("done", "skipped", "would_run") for s in deps):
+                        continue
+                    fp = self._fingerprint(name, fps)
+                    prev = state.get(name) or {}
+                    # überspringen nur, wenn auch keine Eingabe in diesem Lauf neu gerechnet wurde
+                    if (prev.get("fingerprint") == fp and all(s == "skipped" for s in deps)
+                            and all(os.path.exists(o) for o in t["outputs"])
+                            and (t["done"] is None or t["done"]())):
+                        fps[name] = fp
+                        self.status[name] = "skipped"
+                        pending.remove(name)
+                        changed = True
+                        continue
+                    if dry_run:
+                        fps[name] = fp
+                        self.status[name] = "would_run"
+                        pending.remove(name)
+                        changed = True
+                        log(f"[would run] {name}")
+                        continue
+                    # zu teure Tasks dürfen allein laufen, sonst Budget einhalten
+                    if used + t["cost"] > self.cpu_budget and running:
+                        continue
+                    used += t["cost"]
+                    fps[name] = fp
+                    pending.remove(name)
+                    running[pool.submit(self._execute, name)] = name
+                    self.status[name] = "running"
+                    log(f"[start] {name}")
+
+        with ThreadPoolExecutor(max_workers=self.cpu_budget) as pool:
+            schedule()
+            while running:
+                finished, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    name = running.pop(fut)
+                    used -= self.tasks[name]["cost"]
+                    try:
+                        t0, t1 = fut.result()
+                    except Exception as e:
+                        self.status[name] = "failed"
+                        log(f"[failed] {name}: {e}")
+                        continue
+                    self.status[name] = "done"
+                    self.timing[name] = (t0 - t_start, t1 - t_start)
+                    state[name] = {"fingerprint": fps[name], "seconds": round(t1 - t0, 3)}
+                    self._save_state(state)
+                    log(f"[done] {name} ({t1 - t0:.1f} s)")
+                schedule()
+        for name in pending:
+            self.status[name] = "blocked"
+        self.wall = time.perf_counter() - t_start
+        return not any(s in ("failed", "blocked") for s in self.status.values())
+
+    def report(self):
+        """
+        Pro Stufe: ausgeführte/übersprungene/fehlgeschlagene Tasks (bei dry_run: würden laufen), Wandzeit (erster Start bis
+        letztes Ende), summierte Task-Zeit und Durchsatz (Tasks/s Wandzeit).
+        """
+        stages = {}
+        for name, t in self.tasks.items():
+            s = stages.setdefault(t["stage"], {"done": 0, "would_run": 0, "skipped": 0, "failed": 0, "blocked": 0,
+                                               "spans": []})
+            st = self.status.get(name, "blocked")
+            s[st if st in s else "blocked"] += 1
+            if name in self.timing:
+                s["spans"].append(self.timing[name])
+        lines = [f"{'stage':<12}{'run':>6}{'would':>6}{'skip':>6}{'fail':>6}{'wall s':>10}{'busy s':>10}{'tasks/s':>10}"]
+        for stage, s in stages.items():
+            spans = s["spans"]
+            wall = (max(e for _, e in spans) - min(b for b, _ in spans)) if spans else 0.0
+            busy = sum(e - b for b, e in spans)
+            rate = f"{s['done'] / wall:.2f}" if wall > 0 else "-"
+            lines.append(f"{stage:<12}{s['done']:>6}{s['would_run']:>6}{s['skipped']:>6}{s['failed'] + s['blocked']:>6}"
+                         f"{wall:>10.1f}{busy:>10.1f}{rate:>10}")
+        lines.append(f"total wall {self.wall:.1f} s, CPU-Budget {self.cpu_budget}")
+        return "\n".join(lines)
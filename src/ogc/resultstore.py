@@ -0,0 +1,300 @@
+import datetime
+import json
+import os
+import sqlite3
+import uuid
+from glob import glob
+
+# Ergebnis-Ablage pro --out-dir: eine Zeile pro Lauf statt einer JSON-Datei pro Lauf
+STORE_NAME = "results.sqlite"
+
+# indizierte Parameter-/Ergebnisspalten; params und result liegen vollständig als JSON daneben
+COLUMNS = ("seed", "null_mode", "band_min", "band_max", "n", "n_null", "mode", "stat", "p_value")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id        INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id    TEXT NOT NULL UNIQUE,
+    test      TEXT NOT NULL,
+    created   TEXT NOT NULL,
+    tag       TEXT,
+    seed      INTEGER,
+    null_mode TEXT,
+    band_min  REAL,
+    band_max  REAL,
+    n         INTEGER,
+    n_null    INTEGER,
+    mode      TEXT,
+    stat      REAL,
+    p_value   REAL,
+    params    TEXT NOT NULL,
+    result    TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_test_seed ON runs (test, seed);
+CREATE INDEX IF NOT EXISTS runs_test_null ON runs (test, null_mode, n_null);
+CREATE INDEX IF NOT EXISTS runs_test_band ON runs (test, band_min, band_max);
+CREATE INDEX IF NOT EXISTS runs_test_n ON runs (test, n);
+CREATE INDEX IF NOT EXISTS runs_tag_created ON runs (tag, created);
+"""
+
+def store_path(out_dir):
+    return os.path.join(out_dir, STORE_NAME)
+
+def new_run_id(suffix=None):
+    """
+    Eindeutiger, sortierbarer Laufname: Zeitstempel auf Mikrosekunden + Zufallsanteil.
+    Parallele Läufe in derselben Sekunde (t2-batch, mehrere CLI-Prozesse) kollidieren nicht mehr.
+    """
+    ts = datetime.datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+    rnd = uuid.uuid4().hex[:12]
+    return f"{ts}_{suffix}_{rnd}" if suffix else f"{ts}_{rnd}"
+
+def _num(v):
+    if isinstance(v, bool) or not isinstance(v, (int, float)):
+        return None
+    return v
+
+def _first(*vals):
+    for v in vals:
+        if v is not None:
+            return v
+    return None
+
+def index_columns(obj):
+    """
+    Indexspalten aus einem {"params", "result"}-Datensatz (T2, T3, C*, ...); fehlende Felder -> None.
+    """
+    prm = obj.get("params") or {}
+    res = obj.get("result") or {}
+    band = prm.get("band") or res.get("band") or res.get("band_base") or (None, None)
+    null_mode = _first(prm.get("null_mode"), res.get("null_mode"), prm.get("null"))
+    mode = _first(res.get("mode"), prm.get("mode"))
+    return {
+        "seed": _num(_first(prm.get("seed"), res.get("seed"))),
+        "null_mode": null_mode if isinstance(null_mode, str) else None,
+        "band_min": _num(_first(prm.get("band_min"), band[0])),
+        "band_max": _num(_first(prm.get("band_max"), band[1])),
+        "n": _num(_first(prm.get("n"), res.get("n"))),
+        "n_null": _num(_first(prm.get("n_null"), res.get("n_null"))),
+        "mode": mode if isinstance(mode, str) else None,
+        "stat": _num(_first(res.get("stat"), res.get("A_loop"))),
+        "p_value": _num(_first(res.get("p_value_final"), res.get("p_value"), res.get("p_value_A_loop"))),
+    }
+
+def _where(test=None, tag=None, since=None, params=None, **filters):
+    """
+    WHERE-Klausel; Filterwerte als Skalar (=) oder Liste/Tupel (IN), nur auf Indexspalten.
+    params: {Schlüssel: Wert} auf dem params-JSON (json_extract, Gleichheit), für Parameter
+    ohne eigene Spalte (z.B. target_fs, noise).
+    """
+    conds, vals = [], []
+    for key, v in (params or {}).items():
+        conds.append("json_extract(params, ?) = ?")
+        vals.extend((f'$."{key}"', v))
+    for col, v in (("test", test), ("tag", tag), *filters.items()):
+        if v is None:
+            continue
+        if col not in ("test", "tag") and col not in COLUMNS:
+            raise ValueError(f"unbekannte Spalte {col!r}")
+        if isinstance(v, (list, tuple, set)):
+            v = list(v)
+            conds.append(f"{col} IN ({','.join('?' * len(v))})")
+            vals.extend(v)
+        else:
+            conds.append(f"{col} = ?")
+            vals.append(v)
+    if since is not None:
+        conds.append("created >= ?")
+        vals.append(since.isoformat() if isinstance(since, datetime.datetime) else str(since))
+    return (" WHERE " + " AND ".join(conds)) if conds else "", vals
+
+class ResultStore:
+    """
+    Append-only Ergebnis-Ablage in SQLite (WAL).
+
+    Jeder Lauf ist eine Zeile mit indizierten Parameterspalten (test, seed, null_mode, band, n,
+    n_null, ...) und dem vollständigen params/result als JSON. Jedes append ist eine eigene
+    Transaktion (BEGIN IMMEDIATE): parallele Prozesse schreiben atomar nacheinander, Leser sehen
+    nie halbe Datensätze und werden im WAL-Modus von Schreibern nicht blockiert.
+    SQLite im WAL-Modus braucht ein lokales Dateisystem (kein Netzlaufwerk).
+    """
+
+    def __init__(self, path, timeout=60.0):
+        self.path = path
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=timeout, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(_SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    def append(self, test, obj, tag=None, run_id=None, created=None):
+        """
+        Einen Lauf {"params", "result"} anhängen; Rückgabe run_id.
+        """
+        run_id = run_id or new_run_id()
+        created = created or datetime.datetime.now().isoformat(timespec="microseconds")
+        cols = index_columns(obj)
+        row = (run_id, test, created, tag, *cols.values(),
+               json.dumps(obj.get("params") or {}, ensure_ascii=False),
+               json.dumps(obj.get("result") or {}, ensure_ascii=False))
+        names = ("run_id", "test", "created", "tag", *cols, "params", "result")
+        sql = f"INSERT INTO runs ({','.join(names)}) VALUES ({','.join('?' * len(names))})"
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            self.conn.execute(sql, row)
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        self.conn.execute("COMMIT")
+        return run_id
+
+    def query(self, test=None, tag=None, since=None, full=True, fields=None, after_id=None, **filters):
+        """
+        Läufe in Einfügereihenfolge als dicts (id, run_id, test, created, tag, Indexspalten und mit
+        full=True zusätzlich params/result). Filter: test, tag, since (ISO, created >= since),
+        after_id (nur id > after_id, für inkrementelles Nachlesen), Indexspalten und params
+        (params-JSON), z.B. query("t2", null_mode="all", seed=range(10), params={"target_fs": 20.0}).
+        fields: statt des vollständigen JSON nur einzelne Felder, z.B. ("params.seed",
+        "result.p_value_flip"), per json_extract in SQLite gelesen; params/result enthalten dann
+        nur diese Schlüssel (fehlende -> None).
+        """
+        filters = {k: (list(v) if isinstance(v, range) else v) for k, v in filters.items()}
+        where, vals = _where(test, tag, since, **filters)
+        if after_id is not None:
+            where = f"{where} AND id > ?" if where else " WHERE id > ?"
+            vals.append(int(after_id))
+        names = ["id", "run_id", "test", "created", "tag", *COLUMNS]
+        exprs = list(names)
+        parts = []
+        if fields:
+            for fld in fields:
+                part, _, key = fld.partition(".")
+                if part not in ("params", "result") or not key:
+                    raise ValueError(f"Feld {fld!r}: erwartet params.<key> oder result.<key>")
+                parts.append((part, key))
+                exprs.append(f"json_extract({part}, ?)")
+        elif full:
+            names += ["params", "result"]
+            exprs += ["params", "result"]
+        paths = [f'$."{key}"' for _, key in parts]
+        cur = self.conn.execute(f"SELECT {','.join(exprs)} FROM runs{where} ORDER BY id", paths + vals)
+        for rec in cur:
+            row = dict(zip(names, rec))
+            if parts:
+                row["params"], row["result"] = {}, {}
+                for (part, key), v in zip(parts, rec[len(names):]):
+                    row[part][key] = v
+            elif full:
+                row["params"] = json.loads(row["params"])
+                row["result"] = json.loads(row["result"])
+            yield row
+
+    def count(self, test=None, **filters):
+        filters = {k: (list(v) if isinstance(v, range) else v) for k, v in filters.items()}
+        where, vals = _where(test, **filters)
+        return self.conn.execute(f"SELECT COUNT(*) FROM runs{where}", vals).fetchone()[0]
+
+    def delete(self, test=None, **filters):
+        """
+        Läufe löschen (Filter wie count, mindestens einer); Rückgabe Anzahl. Für Neuberechnungen,
+        die alte Zeilen ersetzen statt sie doppelt anzuhängen.
+        """
+        filters = {k: (list(v) if isinstance(v, range) else v) for k, v in filters.items()}
+        where, vals = _where(test, **filters)
+        if not where:
+            raise ValueError("delete ohne Filter")
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            n = self.conn.execute(f"DELETE FROM runs{where}", vals).rowcount
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        self.conn.execute("COMMIT")
+        return n
+
+    def tests(self):
+        return [r[0] for r in self.conn.execute("SELECT DISTINCT test FROM runs ORDER BY test")]
+
+    def export_json(self, out_dir, test=None, **filters):
+        """
+        Läufe im alten Layout {out_dir}/{test}/{run_id}.json ablegen (Kompatibilität); Rückgabe Pfade.
+        """
+        paths = []
+        for row in self.query(test, **filters):
+            obj = {"params": row["params"], "result": row["result"]}
+            paths.append(save_json(obj, out_dir, row["test"], run_id=row["run_id"]))
+        return paths
+
+def save_json(obj, out_dir, sub, run_id=None):
+    """
+    {out_dir}/{sub}/{run_id}.json atomar schreiben (temporäre Datei + os.replace): kein
+    Überschreiben paralleler Läufe, keine halb geschriebenen Dateien für Leser.
+    """
+    folder = os.path.join(out_dir, sub)
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, f"{run_id or new_run_id()}.json")
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(obj, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+    return path
+
+def _json_runs(folder, test):
+    rows = []
+    for p in sorted(glob(os.path.join(folder, "*.json"))):
+        with open(p, "r", encoding="utf-8") as f:
+            j = json.load(f)
+        mtime = datetime.datetime.fromtimestamp(os.path.getmtime(p)).isoformat(timespec="microseconds")
+        rows.append({"run_id": os.path.splitext(os.path.basename(p))[0], "test": test, "created": mtime,
+                     "tag": None, **index_columns(j),
+                     "params": j.get("params") or {}, "result": j.get("result") or {}})
+    return rows
+
+def _filter_rows(rows, tag=None, since=None, params=None, **filters):
+    """
+    Filter wie _where, aber auf bereits geladenen Zeilen (JSON-Fallback von load_runs).
+    """
+    conds = []
+    for col, v in (("tag", tag), *filters.items()):
+        if v is None:
+            continue
+        if col != "tag" and col not in COLUMNS:
+            raise ValueError(f"unbekannte Spalte {col!r}")
+        conds.append((col, set(v) if isinstance(v, (list, tuple, set, range)) else {v}))
+    if since is not None:
+        since = since.isoformat() if isinstance(since, datetime.datetime) else str(since)
+    params = params or {}
+    return [r for r in rows
+            if all(r.get(col) in vs for col, vs in conds) and (since is None or r["created"] >= since)
+            and all(r["params"].get(k) == v for k, v in params.items())]
+
+def load_runs(root, test, **filters):
+    """
+    Läufe eines Tests für Aggregatoren/Exporter: aus {root}/results.sqlite, falls vorhanden,
+    sonst aus den JSON-Dateien {root}/{test}/*.json (ältere Ergebnisordner).
+    root darf auch der Test-Unterordner selbst sein ({root} = .../t2).
+    Zeilen und Filter (tag, since, Indexspalten) wie ResultStore.query
+    (JSON-Fallback: run_id = Dateiname, created = mtime, tag = None).
+    """
+    root = os.path.normpath(root)
+    if not os.path.exists(store_path(root)) and os.path.basename(root) == test:
+        parent = os.path.dirname(root) or "."
+        if os.path.exists(store_path(parent)):
+            root = parent
+    if os.path.exists(store_path(root)):
+        with ResultStore(store_path(root)) as store:
+            return list(store.query(test, **filters))
+    folder = root if os.path.basename(root) == test and not os.path.isdir(os.path.join(root, test)) \
+        else os.path.join(root, test)
+    return _filter_rows(_json_runs(folder, test), **filters)
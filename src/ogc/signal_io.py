@@ -0,0 +1,179 @@
+import itertools
+import os
+
+import numpy as np
+from scipy.signal import firwin, upfirdn
+
+# Samples pro Lese-/Dezimier-Chunk (pro Kanal)
+DEFAULT_CHUNK = 1 << 20
+
+def _is_number(tok):
+    try:
+        float(tok)
+        return True
+    except ValueError:
+        return False
+
+def _csv_layout(path):
+    """
+    (delimiter, skip_header) aus der ersten nicht-leeren Zeile; Kopfzeile = nicht-numerische Felder.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip() and not line.lstrip().startswith("#"):
+                break
+        else:
+            return None, 0
+    delim = "," if "," in line else (";" if ";" in line else None)
+    fields = [t for t in line.strip().split(delim) if t.strip()]
+    return delim, int(not all(_is_number(t) for t in fields))
+
+def open_signal(path, raw_dtype="float64", raw_columns=1):
+    """
+    Signal-Datei ohne Einlesen öffnen: .npy per np.load(mmap_mode="r"), sonst Rohbinär per np.memmap
+    (raw_dtype, raw_columns Kanäle interleaved). Rückgabe (n,) oder (n, Kanäle).
+    """
+    if path.endswith(".npy"):
+        return np.load(path, mmap_mode="r")
+    mm = np.memmap(path, dtype=raw_dtype, mode="r")
+    return mm if raw_columns == 1 else mm.reshape(-1, raw_columns)
+
+def iter_columns(path, columns, chunk=DEFAULT_CHUNK, dtype="float64", raw_dtype="float64", raw_columns=1):
+    """
+    Chunks (len(columns), m) aus .npy, Rohbinär (.bin/.raw/.dat/.f32/.f64) oder CSV/Text.
+    Binärdateien laufen über memmap, CSV zeilenweise; im Speicher liegt immer nur ein Chunk.
+    """
+    columns = list(columns)
+    ext = os.path.splitext(path)[1].lower()
+    if ext in (".csv", ".txt", ".tsv"):
+        delim, skip = _csv_layout(path)
+        with open(path, "r", encoding="utf-8") as f:
+            lines = (l for l in itertools.islice(f, skip, None) if l.strip() and not l.lstrip().startswith("#"))
+            while True:
+                block = list(itertools.islice(lines, chunk))
+                if not block:
+                    return
+                arr = np.loadtxt(block, delimiter=delim, ndmin=2, dtype=dtype)
+                yield arr[:, columns].T
+    else:
+        sig = open_signal(path, raw_dtype=raw_dtype, raw_columns=raw_columns)
+        for lo in range(0, sig.shape[0], chunk):
+            part = sig[lo:lo + chunk]
+            if part.ndim == 1:
+                if any(c != 0 for c in columns):
+                    raise ValueError(f"{path}: einkanalig, Spalten {columns} nicht vorhanden")
+                part = part[:, None]
+            yield np.asarray(part[:, columns].T, dtype=dtype)
+
+def iter_pair(x_path, y_path=None, x_col=0, y_col=None, chunk=DEFAULT_CHUNK, dtype="float64",
+              raw_dtype="float64", raw_columns=1):
+    """
+    (x, y)-Chunkpaare: zwei Dateien parallel, oder eine mehrspaltige Datei (y_path=None, Spalten x_col/y_col).
+    """
+    if y_path is None:
+        y_col = 1 if y_col is None else y_col
+        for block in iter_columns(x_path, [x_col, y_col], chunk, dtype, raw_dtype, raw_columns):
+            yield block[0], block[1]
+        return
+    y_col = 0 if y_col is None else y_col
+    xs = iter_columns(x_path, [x_col], chunk, dtype, raw_dtype, raw_columns)
+    ys = iter_columns(y_path, [y_col], chunk, dtype, raw_dtype, raw_columns)
+    for bx, by in itertools.zip_longest(xs, ys):
+        if bx is None or by is None or bx.shape[1] != by.shape[1]:
+            raise ValueError("x und y haben unterschiedliche Länge")
+        yield bx[0], by[0]
+
+class ChunkedDecimator:
+    """
+    resample_poly(x, up=1, down=down) über einen Strom von Chunks.
+
+    Gleiches FIR (firwin, Kaiser-Fenster, gleiche Vor-/Nach-Polsterung) und gleiche
+    Ausgabe-Ausrichtung wie scipy.signal.resample_poly; jeder Ausgabewert wird per
+    upfirdn über ein vollständiges Eingabefenster gerechnet, das Ergebnis ist
+    bitgleich zum einmaligen Aufruf. Zwischen den Chunks bleiben nur
+    len(h) + down Samples Zustand liegen.
+    """
+
+    def __init__(self, down, window=("kaiser", 5.0), dtype="float64"):
+        self.down = int(down)
+        if self.down < 1:
+            raise ValueError("down must be >= 1")
+        dtype = np.dtype(dtype)
+        half_len = 10 * self.down
+        # down == 1: resample_poly kopiert nur, das Filter wird nie benutzt
+        h = firwin(2 * half_len + 1, 1.0 / self.down, window=window) if self.down > 1 else np.ones(1)
+        n_pre_pad = self.down - half_len % self.down
+        self.h = np.concatenate([np.zeros(n_pre_pad), h]).astype(dtype)
+        self.n_pre_remove = (half_len + n_pre_pad) // self.down
+        L = self.h.size
+        # Nullen vor dem Signal (Vielfaches von down, >= L-1) -> alle Fenster liegen im Puffer
+        self._lead = -(-(L - 1) // self.down) * self.down
+        self._buf = np.zeros(self._lead, dtype=dtype)
+        self._pos = 0          # Index (inkl. Vorlauf-Nullen) von _buf[0], Vielfaches von down
+        self._next = 0         # nächster Ausgabeindex
+        self.n_in = 0
+        self.dtype = dtype
+
+    def _end(self, i):
+        # letzter Eingabeindex (inkl. Vorlauf) des Fensters von Ausgabe i
+        return (self.n_pre_remove + i) * self.down + self._lead
+
+    def _emit(self, stop):
+        """
+        Ausgaben _next .. stop-1 aus dem Puffer, danach nicht mehr benötigte Samples verwerfen.
+        """
+        if stop <= self._next:
+            return np.empty(0, dtype=self.dtype)
+        L = self.h.size
+        seg = self._buf[:self._end(stop - 1) - self._pos + 1]
+        m0 = (self._end(self._next) - self._pos) // self.down
+        out = upfirdn(self.h, seg, 1, self.down)[m0:m0 + stop - self._next]
+        self._next = stop
+        keep = (self._end(self._next) - (L - 1) - self._pos) // self.down * self.down
+        if keep > 0:
+            self._buf = self._buf[keep:].copy()
+            self._pos += keep
+        return out
+
+    def push(self, chunk):
+        """
+        Chunk anhängen, alle schon vollständig bestimmten Ausgaben zurückgeben.
+        """
+        chunk = np.asarray(chunk, dtype=self.dtype)
+        self.n_in += chunk.size
+        if self.down == 1:
+            return chunk.copy()
+        self._buf = np.concatenate([self._buf, chunk])
+        # Ausgabe i ist fertig, sobald ihr Fenster-Ende eingelesen ist
+        avail = self._pos + self._buf.size - 1
+        stop = max(self._next, (avail - self._lead) // self.down - self.n_pre_remove + 1)
+        return self._emit(stop)
+
+    def finish(self):
+        """
+        Rest nach dem letzten Chunk: Nullen anhängen (wie die Randbehandlung von resample_poly).
+        """
+        if self.down == 1:
+            return np.empty(0, dtype=self.dtype)
+        n_out = -(-self.n_in // self.down)
+        if n_out <= self._next:
+            return np.empty(0, dtype=self.dtype)
+        missing = self._end(n_out - 1) - (self._pos + self._buf.size - 1)
+        if missing > 0:
+            self._buf = np.concatenate([self._buf, np.zeros(missing, dtype=self.dtype)])
+        return self._emit(n_out)
+
+def decimate_pair(chunks, down, dtype="float64"):
+    """
+    (x, y)-Chunkpaare -> (x_ds, y_ds, n_in) wie resample_poly(·, 1, down) auf den ganzen Signalen,
+    ohne dass die vollen Signale im Speicher liegen; n_in = Länge vor der Dezimation.
+    """
+    dx = ChunkedDecimator(down, dtype=dtype)
+    dy = ChunkedDecimator(down, dtype=dtype)
+    xs, ys = [], []
+    for x, y in chunks:
+        xs.append(dx.push(x))
+        ys.append(dy.push(y))
+    xs.append(dx.finish())
+    ys.append(dy.finish())
+    return np.concatenate(xs), np.concatenate(ys), dx.n_in
@@ -0,0 +1,334 @@
+import hashlib
+from collections import OrderedDict
+from functools import lru_cache
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy import fft as sp_fft
+from scipy.signal import detrend as sp_detrend, get_window
+
+# maximale Anzahl gecachter Pläne (Sweeps über nperseg/band erzeugen sonst beliebig viele)
+PLAN_CACHE_SIZE = 32
+# Band-DFT statt voller rfft, wenn das Band höchstens diesen Anteil der Bins abdeckt
+BAND_DFT_MAX_FRACTION = 0.1
+
+def _segment_params(n, nperseg, noverlap):
+    # wie SciPy: nperseg höchstens Signallänge, noverlap < nperseg
+    nperseg = min(int(nperseg), int(n))
+    if noverlap is None:
+        noverlap = nperseg // 2
+    noverlap = min(int(noverlap), max(0, nperseg - 1))
+    return nperseg, noverlap
+
+@lru_cache(maxsize=16)
+def _window(window, nperseg):
+    w = get_window(window, nperseg)
+    w.setflags(write=False)
+    return w
+
+def compute_dtype(*arrays):
+    """
+    Rechen-dtype für Signale: float32 bleibt float32 (FFT dann in complex64), sonst float64.
+    """
+    return np.result_type(*[np.asarray(a).dtype for a in arrays], np.float32)
+
+def _density_scale(nperseg, fs, win):
+    # Dichte-Skalierung inkl. Verdopplung der einseitigen Bins (DC/Nyquist ausgenommen)
+    scale = np.full(nperseg // 2 + 1, 1.0 / (fs * (win * win).sum()))
+    if nperseg % 2:
+        scale[1:] *= 2
+    else:
+        scale[1:-1] *= 2
+    return scale
+
+def segment_view(sig, nperseg, noverlap):
+    """
+    Zero-copy Segment-View (…, nseg, nperseg) eines (…, n)-Signals (Welch-Layout, ohne Padding).
+    """
+    step = nperseg - noverlap
+    return sliding_window_view(np.asarray(sig), nperseg, axis=-1)[..., ::step, :]
+
+def _detrended(seg, detrend):
+    if detrend == "constant":
+        return seg - seg.mean(axis=-1, keepdims=True)
+    if detrend == "linear":
+        return sp_detrend(seg, type="linear", axis=-1)
+    return seg
+
+def segment_spectra(sig, nperseg, noverlap, win, detrend="constant"):
+    """
+    (…, n) -> (…, nseg, nfreq): strided Segmente, einmal detrenden + fenstern, eine rfft.
+    Das Fenster folgt dem dtype der Segmente (float32 -> rfft in complex64).
+    """
+    seg = _detrended(segment_view(sig, nperseg, noverlap), detrend)
+    return sp_fft.rfft(seg * win.astype(compute_dtype(seg), copy=False), axis=-1)
+
+def welch_spectra(x, y, fs=1.0, nperseg=256, noverlap=None, window="hann", detrend="constant"):
+    """
+    Fusionierter Welch/CSD-Kernel: (f, Pxx, Pyy, Pxy) aus denselben Segment-Spektren.
+    Eine rfft pro Signal statt je zwei (welch + csd); x und y dürfen gebatcht (…, n)
+    sein und werden gebroadcastet. Numerisch wie scipy welch/csd (average="mean").
+    float32-Eingaben werden durchgehend in float32/complex64 gerechnet.
+    """
+    nperseg, noverlap = _segment_params(np.shape(x)[-1], nperseg, noverlap)
+    dtype = compute_dtype(x, y)
+    x = np.asarray(x, dtype=dtype)
+    y = x if y is x else np.asarray(y, dtype=dtype)
+    win = _window(window, nperseg)
+    scale = _density_scale(nperseg, fs, win).astype(dtype, copy=False)
+    win = win.astype(dtype, copy=False)
+    Fx = segment_spectra(x, nperseg, noverlap, win, detrend)
+    Fy = Fx if y is x else segment_spectra(y, nperseg, noverlap, win, detrend)
+    Pxx = (Fx.real**2 + Fx.imag**2).mean(axis=-2) * scale
+    Pyy = (Fy.real**2 + Fy.imag**2).mean(axis=-2) * scale
+    Pxy = (np.conjugate(Fx) * Fy).mean(axis=-2) * scale
+    f = sp_fft.rfftfreq(nperseg, 1.0 / fs)
+    return f, Pxx, Pyy, Pxy
+
+def mscoh(x, y, fs=1.0, nperseg=256, noverlap=None, window="hann", detrend="constant"):
+    """
+    Magnitude-squared coherence Cxy(f) = |Pxy|^2 / (Pxx * Pyy) über den fusionierten Kernel.
+    """
+    f, Pxx, Pyy, Pxy = welch_spectra(x, y, fs=fs, nperseg=nperseg, noverlap=noverlap,
+                                     window=window, detrend=detrend)
+    C = (np.abs(Pxy) ** 2) / (Pxx * Pyy + 1e-12)
+    return f, np.clip(C.real, 0.0, 1.0)
+
+class SpectralPlan:
+    """
+    Wiederverwendbarer Welch/CSD-Plan für feste (n, fs, nperseg, noverlap, window, band).
+
+    Cacht Fenster, Segment-Layout, Frequenzgitter, Dichte-Skalierung und Band-Maske
+    sowie die Segment-FFTs (und Autospektren) von Signalen, die über viele
+    Surrogates gleich bleiben (z.B. x im Flip-Null).
+    Numerisch wie scipy.signal.welch/csd mit detrend="constant", average="mean".
+
+    Für schmale Bänder (Anteil <= BAND_DFT_MAX_FRACTION, oder band_dft=True) werden
+    die In-Band-Bins direkt per kleiner DFT-Matrix über die Segmente ausgewertet
+    statt per voller rfft (band_coherence).
+
+    dtype="float32" rechnet Segmente, Fenster und Skalierung in float32 und die FFTs
+    in complex64 (halber Speicherverkehr für große Surrogate-Blöcke); Eingaben werden
+    auf dtype gebracht.
+    """
+
+    def __init__(self, n, fs=1.0, nperseg=256, noverlap=None, window="hann", band=None, max_fixed=4,
+                 band_dft=None, dtype=np.float64):
+        n = int(n)
+        nperseg, noverlap = _segment_params(n, nperseg, noverlap)
+        nseg = (n - noverlap) // (nperseg - noverlap)
+
+        self.n = n
+        self.fs = float(fs)
+        self.nperseg = nperseg
+        self.noverlap = noverlap
+        self.window = window
+        self.dtype = np.dtype(dtype)
+        self.band = None if band is None else (float(band[0]), float(band[1]))
+
+        self.nseg = nseg
+        win = _window(window, nperseg)
+        self.win = win.astype(self.dtype, copy=False)
+        self.freqs = sp_fft.rfftfreq(nperseg, 1.0 / self.fs)
+        self.scale = _density_scale(nperseg, self.fs, win).astype(self.dtype, copy=False)
+
+        if self.band is None:
+            self.band_mask = np.ones(self.freqs.shape, dtype=bool)
+        else:
+            self.band_mask = (self.freqs >= self.band[0]) & (self.freqs <= self.band[1])
+        self.band_bins = np.flatnonzero(self.band_mask)
+
+        k = self.band_bins.size
+        if band_dft is None:
+            band_dft = 0 < k <= BAND_DFT_MAX_FRACTION * self.freqs.size
+        self.band_dft = bool(band_dft)
+        if self.band_dft:
+            # gefensterte DFT-Matrix nur für die Band-Bins, Real-/Imaginärteil nebeneinander
+            arg = 2 * np.pi * np.outer(np.arange(nperseg), self.band_bins) / nperseg
+            self.band_matrix = np.concatenate([win[:, None] * np.cos(arg),
+                                               -win[:, None] * np.sin(arg)], axis=1).astype(self.dtype, copy=False)
+
+        self._fixed = OrderedDict()
+        self._max_fixed = int(max_fixed)
+
+    @property
+    def band_fraction(self):
+        return float(self.band_mask.mean())
+
+    def matches(self, n, fs, nperseg, band=None, dtype=None, noverlap=None, window="hann"):
+        """
+        Passt der Plan zu diesen Parametern? noverlap/window wie im Konstruktor (None = nperseg // 2);
+        ein Plan mit anderer Überlappung oder anderem Fenster liefert andere Spektren.
+        """
+        band = None if band is None else (float(band[0]), float(band[1]))
+        nperseg, noverlap = _segment_params(n, nperseg, noverlap)
+        return (self.n == int(n) and self.fs == float(fs)
+                and self.nperseg == nperseg and self.noverlap == noverlap and self.band == band
+                and (self.window == window or np.array_equal(_window(self.window, nperseg), _window(window, nperseg)))
+                and (dtype is None or self.dtype == np.dtype(dtype)))
+
+    def _cast(self, sig):
+        return np.asarray(sig, dtype=self.dtype)
+
+    # ---- Segment-Spektren ----
+    def segment_fft(self, sig):
+        """
+        (…, n) -> (…, nseg, nfreq): segmentieren, Mittelwert abziehen, fenstern, rfft.
+        """
+        return segment_spectra(self._cast(sig), self.nperseg, self.noverlap, self.win)
+
+    def band_fft(self, sig):
+        """
+        (…, n) -> (…, nseg, k): Segment-Spektren nur für die k Band-Bins.
+        """
+        if not self.band_dft:
+            return self.segment_fft(sig)[..., self.band_bins]
+        k = self.band_bins.size
+        seg = _detrended(segment_view(self._cast(sig), self.nperseg, self.noverlap), "constant")
+        R = seg @ self.band_matrix
+        return R[..., :k] + 1j * R[..., k:]
+
+    def fixed(self, sig, band=False):
+        """
+        Segment-FFT und Autospektrum eines invarianten Signals, gecacht (LRU über Inhalt).
+        band=True: nur die Band-Bins (wie band_fft).
+        """
+        sig = np.ascontiguousarray(sig, dtype=self.dtype)
+        key = (bool(band), sig.shape, sig.dtype.str, hashlib.sha1(sig.tobytes()).digest())
+        hit = self._fixed.get(key)
+        if hit is not None:
+            self._fixed.move_to_end(key)
+            return hit
+        if band:
+            F = self.band_fft(sig)
+            hit = (F, self.auto_spectrum(F, band=True))
+        else:
+            F = self.segment_fft(sig)
+            hit = (F, self.auto_spectrum(F))
+        self._fixed[key] = hit
+        if len(self._fixed) > self._max_fixed:
+            self._fixed.popitem(last=False)
+        return hit
+
+    # ---- Spektren / Kohärenz ----
+    def _scale(self, band):
+        return self.scale[self.band_bins] if band else self.scale
+
+    def auto_spectrum(self, F, band=False):
+        return (F.real**2 + F.imag**2).mean(axis=-2) * self._scale(band)
+
+    def cross_spectrum(self, Fx, Fy, band=False):
+        return (np.conjugate(Fx) * Fy).mean(axis=-2) * self._scale(band)
+
+    def coherence_from_fft(self, Fx, Fy, Pxx=None, Pyy=None, band=False):
+        if Pxx is None:
+            Pxx = self.auto_spectrum(Fx, band=band)
+        if Pyy is None:
+            Pyy = self.auto_spectrum(Fy, band=band)
+        Pxy = self.cross_spectrum(Fx, Fy, band=band)
+        C = (np.abs(Pxy) ** 2) / (Pxx * Pyy + 1e-12)
+        return np.clip(C.real, 0.0, 1.0)
+
+    def coherence(self, x, y, fixed_x=False, fixed_y=False):
+        """
+        Magnitude-squared coherence (f, C); fixed_x/fixed_y nutzen den Cache für invariante Signale.
+        x und y dürfen gebatcht sein (…, n) und werden gebroadcastet.
+        """
+        Fx, Pxx = self.fixed(x) if fixed_x else (self.segment_fft(x), None)
+        Fy, Pyy = self.fixed(y) if fixed_y else (self.segment_fft(y), None)
+        return self.freqs, self.coherence_from_fft(Fx, Fy, Pxx=Pxx, Pyy=Pyy)
+
+    def band_coherence(self, x, y, fixed_x=False, fixed_y=False):
+        """
+        Wie coherence, aber nur auf den Band-Bins: (…, k). Per Band-DFT, falls aktiv.
+        """
+        Fx, Pxx = self.fixed(x, band=True) if fixed_x else (self.band_fft(x), None)
+        Fy, Pyy = self.fixed(y, band=True) if fixed_y else (self.band_fft(y), None)
+        return self.coherence_from_fft(Fx, Fy, Pxx=Pxx, Pyy=Pyy, band=True)
+
+    def sub_band_masks(self, bands):
+        """
+        (n_bands, k)-Masken der Bänder [(f1, f2), ...] auf den Band-Bins des Plans.
+        """
+        fb = self.freqs[self.band_bins]
+        return np.array([(fb >= lo) & (fb <= hi) for lo, hi in bands], dtype=bool).reshape(len(bands), fb.size)
+
+    def band_stat(self, C, mode="mean"):
+        """
+        Band-Statistik entlang der letzten Achse (nutzt die Band-Maske des Plans).
+        C darf volles Spektrum (nfreq) oder schon auf die Band-Bins reduziert (k) sein.
+        """
+        Cb = C if C.shape[-1] == self.band_bins.size else C[..., self.band_mask]
+        if Cb.shape[-1] == 0:
+            return np.zeros(C.shape[:-1])
+        return Cb.max(axis=-1) if mode == "peak" else Cb.mean(axis=-1)
+
+def multi_band_stat(C, masks, mode="mean"):
+    """
+    Band-Statistiken für mehrere Bänder in einem Schritt: C (…, k), masks (n_bands, k) -> (…, n_bands).
+    Leere Bänder liefern 0 (wie band_stat).
+    """
+    hit = masks.any(axis=-1)
+    if mode == "peak":
+        out = np.where(masks, C[..., None, :], -np.inf).max(axis=-1, initial=-np.inf)
+        return np.where(hit, out, 0.0)
+    cnt = np.maximum(masks.sum(axis=-1), 1)
+    return np.where(hit, (C @ masks.T.astype(C.dtype)) / cnt, 0.0)
+
+class BandQuery:
+    """
+    Bandabfragen in O(1) auf festen Kohärenzspektren (f aufsteigend, C (…, nfreq)).
+    mode="mean" über Präfixsummen, mode="peak" über eine Sparse Table (Range-Max).
+    Gleiche Band-Semantik wie band_stat: f1 <= f <= f2, leeres Band -> 0.
+    Alle Abfragen sind vektorisiert und broadcasten, z.B. stats(lo[:, None], hi[None, :])
+    für ein 2-D (low_edge × high_edge)-Gitter; gebatchte C (B, nfreq) liefern (B, …).
+    """
+
+    def __init__(self, f, C):
+        self.f = np.asarray(f, dtype=float)
+        C = np.asarray(C, dtype=float)
+        n = C.shape[-1]
+        self.csum = np.concatenate([np.zeros(C.shape[:-1] + (1,)), np.cumsum(C, axis=-1)], axis=-1)
+        levels = [C]
+        while 2 ** len(levels) <= n:
+            prev, h = levels[-1], 2 ** (len(levels) - 1)
+            levels.append(np.maximum(prev[..., :-h], prev[..., h:]))
+        # Ebenen mit -inf auf gleiche Länge auffüllen -> ein Gather pro Abfrage
+        self.table = np.full(C.shape[:-1] + (len(levels), n), -np.inf)
+        for j, lev in enumerate(levels):
+            self.table[..., j, :lev.shape[-1]] = lev
+
+    def _range(self, lo, hi):
+        i0 = np.searchsorted(self.f, lo, side="left")
+        i1 = np.searchsorted(self.f, hi, side="right")
+        return i0, np.maximum(i1, i0)
+
+    def stats(self, lo, hi, mode="mean"):
+        lo, hi = np.broadcast_arrays(np.asarray(lo, dtype=float), np.asarray(hi, dtype=float))
+        i0, i1 = self._range(lo, hi)
+        cnt = i1 - i0
+        hit = cnt > 0
+        if mode == "peak":
+            last = self.table.shape[-1] - 1
+            k = np.floor(np.log2(np.maximum(cnt, 1))).astype(int)
+            a = self.table[..., k, np.minimum(i0, last)]
+            b = self.table[..., k, np.clip(i1 - 2 ** k, 0, last)]
+            return np.where(hit, np.maximum(a, b), 0.0)
+        return np.where(hit, (self.csum[..., i1] - self.csum[..., i0]) / np.maximum(cnt, 1), 0.0)
+
+    def stat(self, band, mode="mean"):
+        return float(self.stats(band[0], band[1], mode=mode))
+
+@lru_cache(maxsize=PLAN_CACHE_SIZE)
+def _cached_plan(n, fs, nperseg, noverlap, window, band, dtype):
+    return SpectralPlan(n, fs=fs, nperseg=nperseg, noverlap=noverlap, window=window, band=band, dtype=dtype)
+
+def get_plan(n, fs=1.0, nperseg=256, noverlap=None, window="hann", band=None, dtype="float64"):
+    """
+    Plan aus dem beschränkten LRU-Cache (PLAN_CACHE_SIZE Einträge).
+    """
+    band = None if band is None else (float(band[0]), float(band[1]))
+    return _cached_plan(int(n), float(fs), int(nperseg), noverlap, window, band, np.dtype(dtype).name)
+
+def clear_plan_cache():
+    _cached_plan.cache_clear()
@@ -1,5 +1,9 @@
+import copy
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
 import numpy as np
-from scipy.signal import welch, csd
+from scipy import fft as sp_fft
+from ogc.spectral import compute_dtype, get_plan, multi_band_stat, segment_view, welch_spectra
 
 def _mscoh(x, y, fs=1.0, nperseg=512, noverlap=None, detrend="constant"):
     """
@@ -11,9 +15,8 @@ def _mscoh(x, y, fs=1.0, nperseg=512, noverlap=None, detrend="constant"):
     # SciPy verlangt: noverlap < nperseg
     noverlap = min(noverlap, max(0, nperseg - 1))
 
-    f, Pxx = welch(x, fs=fs, nperseg=nperseg, noverlap=noverlap, detrend=detrend)
-    _, Pyy = welch(y, fs=fs, nperseg=nperseg, noverlap=noverlap, detrend=detrend)
-    _, Pxy = csd(x, y, fs=fs, nperseg=nperseg, noverlap=noverlap, detrend=detrend)
+    # fusionierter Kernel: eine rfft pro Signal für Pxx, Pyy und Pxy (auch gebatcht)
+    f, Pxx, Pyy, Pxy = welch_spectra(x, y, fs=fs, nperseg=nperseg, noverlap=noverlap, detrend=detrend)
     C = (np.abs(Pxy) ** 2) / (Pxx * Pyy + 1e-12)
     C = np.clip(C.real, 0.0, 1.0)
     return f, C
@@ -22,15 +25,26 @@ def _phase_surrogate(sig, rng):
     """
     Phase-only surrogate: random phases, preserve amplitude spectrum.
     """
-    X = np.fft.rfft(sig)
-    amp = np.abs(X)
-    ph = rng.uniform(0, 2*np.pi, size=amp.shape)
+    amp = np.abs(sp_fft.rfft(sig))
+    return _phase_surrogate_block(amp[None, :], len(sig), 1, rng)[0, 0]
+
+def _phase_surrogate_block(amps, n, n_surr, rng):
+    """
+    Gebatchte Phase-only Surrogates für k Signale mit festen Amplitudenspektren.
+      amps: (k, n//2+1) = |rfft| der k Signale (einmal vorab berechnet)
+    Zieht alle Phasen in einem RNG-Aufruf der Form (n_surr, k, n//2+1) und macht
+    einen einzigen irfft. Die Ziehreihenfolge entspricht n_surr-mal nacheinander
+    _phase_surrogate für jedes der k Signale.
+    Gerechnet wird im dtype von amps (float32 -> complex64); der RNG-Strom ist derselbe.
+    Rückgabe: (n_surr, k, n)
+    """
+    ph = rng.uniform(0, 2*np.pi, size=(n_surr,) + amps.shape)
     # DC und Nyquist real lassen
-    ph[0] = 0.0
-    if (len(sig) % 2) == 0:
-        ph[-1] = 0.0
-    Xs = amp * np.exp(1j * ph)
-    return np.fft.irfft(Xs, n=len(sig))
+    ph[..., 0] = 0.0
+    if (n % 2) == 0:
+        ph[..., -1] = 0.0
+    Xs = amps * np.exp(1j * ph.astype(amps.dtype, copy=False))
+    return sp_fft.irfft(Xs, n=n, axis=-1)
 
 def _stat_from_band(x, y, fs, nperseg, band, mode="mean"):
     f, C = _mscoh(x, y, fs=fs, nperseg=nperseg)
@@ -43,6 +57,249 @@ def _stat_from_band(x, y, fs, nperseg, band, mode="mean"):
     else:
         return float(Cb.mean()), float(mask.mean())
 
+def _draw_flip_params(rng, n_null, n):
+    """
+    Vorzeichen und Zirkularshifts für alle Flip-Surrogates vorab ziehen.
+    Reihenfolge der RNG-Aufrufe wie in der früheren Einzelschleife (sign, shift, sign, ...),
+    damit p-Werte für einen festen Seed identisch bleiben.
+    """
+    signs = np.empty(n_null, dtype=float)
+    shifts = np.empty(n_null, dtype=np.int64)
+    for i in range(n_null):
+        signs[i] = -1.0 if rng.random() < 0.5 else 1.0
+        shifts[i] = rng.integers(0, n)
+    return signs, shifts
+
+def _flip_block(y, signs, shifts):
+    """
+    Block (B, n) mit Zeilen np.roll(sign * y, shift) – per Gather-Index statt B-mal np.roll.
+    """
+    n = len(y)
+    idx = (np.arange(n)[None, :] - shifts[:, None]) % n
+    return signs.astype(y.dtype, copy=False)[:, None] * y[idx]
+
+def _reduce(plan, C, mode, masks=None):
+    # ein Band: (…,); mehrere Bänder (masks (n_bands, k)): (…, n_bands) in einem Schritt
+    if masks is None:
+        return plan.band_stat(C, mode=mode)
+    return multi_band_stat(C, masks, mode=mode)
+
+def _flip_stats(x, y, signs, shifts, plan, mode, masks=None):
+    C = plan.band_coherence(x, _flip_block(y, signs, shifts), fixed_x=True)
+    return _reduce(plan, C, mode, masks)
+
+def _phase_stats(amps, n, n_surr, rng, plan, mode, masks=None):
+    S = _phase_surrogate_block(amps, n, n_surr, rng)
+    C = plan.band_coherence(S[:, 0], S[:, 1])
+    return _reduce(plan, C, mode, masks)
+
+# ---- parallele Nulls (workers=) ----
+# Jeder Chunk fester Größe bekommt sein eigenes SeedSequence-Kind; die Nulls hängen
+# daher nicht von der Worker-Zahl ab. x, y liegen für die Worker im Shared Memory.
+_WORKER = {}
+
+# Streaming-Null: Zufallsblock = NULL_BLOCK_SPANS Segmentlängen (siehe CoherenceAccumulator)
+NULL_BLOCK_SPANS = 4
+
+def _seed_sequence(rng):
+    """
+    Frische SeedSequence-Wurzel (Kopie), damit spawn() bei jedem Aufruf dieselben Kinder liefert.
+    """
+    if isinstance(rng, np.random.Generator):
+        ss = rng.bit_generator.seed_seq
+    elif isinstance(rng, np.random.SeedSequence):
+        ss = rng
+    else:
+        ss = np.random.SeedSequence(rng)
+    return np.random.SeedSequence(ss.entropy, spawn_key=ss.spawn_key, pool_size=ss.pool_size)
+
+def _init_null_worker(shm_name, n, dtype, plan):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    xy = np.ndarray((2, n), dtype=dtype, buffer=shm.buf)
+    _WORKER.update(shm=shm, x=xy[0], y=xy[1], plan=plan, amps=None)
+
+def _worker_amps(x, y):
+    if _WORKER.get("amps") is None:
+        _WORKER["amps"] = np.abs(sp_fft.rfft(np.stack([x, y]), axis=-1))
+    return _WORKER["amps"]
+
+def _null_chunk(kind, seed_seq, n_surr, mode, masks=None, x=None, y=None, amps=None, plan=None):
+    if x is None:
+        x, y, plan = _WORKER["x"], _WORKER["y"], _WORKER["plan"]
+        if kind == "phase":
+            amps = _worker_amps(x, y)
+    rng = np.random.default_rng(seed_seq)
+    if kind == "flip":
+        signs, shifts = _draw_flip_params(rng, n_surr, len(y))
+        return _flip_stats(x, y, signs, shifts, plan, mode, masks)
+    return _phase_stats(amps, len(x), n_surr, rng, plan, mode, masks)
+
+def _serial_blocks(kind, rng, n_null, step, mode, masks, x, y, amps, plan):
+    """
+    Null-Statistiken blockweise aus dem seriellen RNG-Strom (workers=None).
+    Flip-Parameter werden vorab für alle n_null gezogen, ein früher Abbruch
+    verschiebt den Strom für einen nachfolgenden Phase-Null also nicht.
+    """
+    if kind == "flip":
+        # einfache Phasenzerstörung durch zufälliges +/- und Zirkularshift
+        signs, shifts = _draw_flip_params(rng, n_null, len(y))
+        for lo in range(0, n_null, step):
+            hi = min(lo + step, n_null)
+            yield _flip_stats(x, y, signs[lo:hi], shifts[lo:hi], plan, mode, masks)
+    else:
+        for lo in range(0, n_null, step):
+            hi = min(lo + step, n_null)
+            yield _phase_stats(amps, len(x), hi - lo, rng, plan, mode, masks)
+
+def _chunked_blocks(kind, seed_seq, n_null, chunk, mode, masks, pool, x, y, amps, plan):
+    """
+    Null-Verteilung in Chunks à chunk Surrogates, Chunk j mit seed_seq.spawn(...)[j].
+    pool=None: alle Chunks im eigenen Prozess (gleiches Ergebnis).
+    """
+    sizes = [min(chunk, n_null - lo) for lo in range(0, n_null, chunk)]
+    children = seed_seq.spawn(len(sizes))
+    if pool is None:
+        for ss, b in zip(children, sizes):
+            yield _null_chunk(kind, ss, b, mode, masks, x=x, y=y, amps=amps, plan=plan)
+        return
+    futs = [pool.submit(_null_chunk, kind, ss, b, mode, masks) for ss, b in zip(children, sizes)]
+    try:
+        for f in futs:
+            yield f.result()
+    finally:
+        for f in futs:
+            f.cancel()
+
+# Bindungen null == stat: die gebatchten Kernel summieren in anderer Reihenfolge als die
+# Einzelberechnung von stat_obs; ein Surrogate, das x und y unverändert lässt (Shift 0,
+# Vorzeichen +), landet dann ein paar ulp unter stat_obs. Nulls bis TIE_ULPS * eps(dtype)
+# relativ unter stat_obs zählen daher als Bindung (= Überschreitung, wie in der Einzelschleife).
+TIE_ULPS = 64
+
+def _tie_floor(stat, dtype):
+    stat = np.asarray(stat, dtype=np.float64)
+    return stat - TIE_ULPS * np.finfo(dtype).eps * np.abs(stat)
+
+def _collect_nulls(blocks, stat_obs, seq_h=None, floor=None):
+    """
+    Null-Blöcke einsammeln -> (nulls, p, n_used).
+    Mit seq_h: sequentielles Monte Carlo nach Besag & Clifford (1991) – Abbruch,
+    sobald seq_h Überschreitungen (null >= stat_obs) erreicht sind, dann p = seq_h / n_used.
+    Ohne Abbruch wie bisher p = Anteil der Überschreitungen.
+    Mehrere Bänder: Blöcke (b, n_bands), p pro Band (nur ohne seq_h).
+    floor (_tie_floor): Nulls in [floor, stat_obs) werden auf stat_obs gesetzt (Bindung), auch
+    in den zurückgegebenen Nulls, damit eine Neuberechnung aus ihnen dasselbe p ergibt.
+    """
+    parts, n_exc = [], 0
+    try:
+        for block in blocks:
+            if floor is not None:
+                block = np.where((block < stat_obs) & (block >= floor), stat_obs, block)
+            if seq_h:
+                c = n_exc + np.cumsum(block >= stat_obs)
+                hit = np.flatnonzero(c >= seq_h)
+                if hit.size:
+                    parts.append(block[:hit[0] + 1])
+                    nulls = np.concatenate(parts)
+                    return nulls, float(seq_h) / nulls.size, nulls.size
+                n_exc = int(c[-1]) if c.size else n_exc
+            parts.append(block)
+    finally:
+        blocks.close()
+    nulls = np.concatenate(parts) if parts else np.empty((0,) + np.shape(stat_obs))
+    p = (nulls >= stat_obs).mean(axis=0)
+    return nulls, (float(p) if p.ndim == 0 else p), nulls.shape[0]
+
+def _p_se(p, n):
+    if p is None or not n:
+        return None
+    return float(np.sqrt(p * (1.0 - p) / n))
+
+def _combine_p(null_mode, p_flip, p_phase):
+    if null_mode == "flip":
+        return p_flip
+    if null_mode == "phase":
+        return p_phase
+    # konservativ: größeres p (pro Band, falls Arrays)
+    vals = [v for v in (p_flip, p_phase) if v is not None]
+    if not vals:
+        return None
+    return np.maximum.reduce(vals) if np.ndim(vals[0]) else float(max(vals))
+
+def _multi_band_result(bands, plan, stat_obs, nulls, p, n_used, mode, null_mode, fwer, floor):
+    """
+    Ergebnis-dict für bands=[...]: Skalarfelder wie gewohnt für das erste Band,
+    dazu Listen pro Band und optional max-Statistik-p (FWER).
+    """
+    f = plan.freqs
+    fracs = [float(((f >= lo) & (f <= hi)).mean()) for lo, hi in bands]
+    p_final = _combine_p(null_mode, p.get("flip"), p.get("phase"))
+
+    def _lst(v):
+        return None if v is None else [float(u) for u in v]
+
+    def _first(v):
+        return None if v is None else float(v[0])
+
+    out = {
+        "stat": float(stat_obs[0]),
+        "band_fraction": fracs[0],
+        "mode": mode,
+        "null_mode": null_mode,
+        "p_value_flip": _first(p.get("flip")),
+        "p_value_phase": _first(p.get("phase")),
+        "p_value_final": _first(p_final),
+        "decision_alpha_0.05": (p_final is not None and float(p_final[0]) < 0.05),
+        "seq_h": None,
+        "n_used_flip": n_used.get("flip"),
+        "n_used_phase": n_used.get("phase"),
+        "bands": [[lo, hi] for lo, hi in bands],
+        "stat_bands": _lst(stat_obs),
+        "band_fraction_bands": fracs,
+        "p_value_flip_bands": _lst(p.get("flip")),
+        "p_value_phase_bands": _lst(p.get("phase")),
+        "p_value_final_bands": _lst(p_final),
+    }
+    if fwer:
+        # max-T: Verteilung des Band-Maximums je Surrogate gegen jede beobachtete Band-Statistik
+        p_fwer = {k: (v.max(axis=1)[:, None] >= floor[None, :]).mean(axis=0) for k, v in nulls.items()}
+        out["p_value_fwer_flip"] = _lst(p_fwer.get("flip"))
+        out["p_value_fwer_phase"] = _lst(p_fwer.get("phase"))
+        out["p_value_fwer_final"] = _lst(_combine_p(null_mode, p_fwer.get("flip"), p_fwer.get("phase")))
+    return out
+
+def _coherence_band_loop(x, y, fs=1.0, band=(0.7, 0.9), nperseg=0, n_null=200, rng=None, mode="mean",
+                         null_mode="flip"):
+    """
+    Referenz: die ursprüngliche Einzelschleife (ein welch/csd-Aufruf pro Surrogate, gleicher
+    RNG-Strom wie coherence_band mit workers=None). Nur für Vergleiche, z.B. ogc.cli t2-loop-check.
+    Rückgabe dict(stat, p_value_flip, p_value_phase, p_value_final).
+    """
+    rng = np.random.default_rng(rng)
+    if nperseg in (None, 0):
+        nperseg = max(128, min(len(x), len(y)) // 6)
+    if nperseg % 2 == 1:
+        nperseg += 1
+    stat_obs, _ = _stat_from_band(x, y, fs, nperseg, band, mode=mode)
+    rng_phase = copy.deepcopy(rng) if null_mode == "all" else rng
+    p = {}
+    if null_mode in ("flip", "both", "all"):
+        nulls = np.empty(n_null)
+        for i in range(n_null):
+            sign = -1.0 if rng.random() < 0.5 else 1.0
+            shift = rng.integers(0, len(y))
+            nulls[i], _ = _stat_from_band(x, np.roll(sign * y, shift), fs, nperseg, band, mode=mode)
+        p["flip"] = float((nulls >= stat_obs).mean())
+    if null_mode in ("phase", "both", "all"):
+        nulls = np.empty(n_null)
+        for i in range(n_null):
+            xs = _phase_surrogate(x, rng_phase)
+            ys = _phase_surrogate(y, rng_phase)
+            nulls[i], _ = _stat_from_band(xs, ys, fs, nperseg, band, mode=mode)
+        p["phase"] = float((nulls >= stat_obs).mean())
+    return {"stat": float(stat_obs), "p_value_flip": p.get("flip"), "p_value_phase": p.get("phase"),
+            "p_value_final": _combine_p(null_mode, p.get("flip"), p.get("phase"))}
+
 def coherence_band(
     x, y,
     fs=1.0,
@@ -51,20 +308,77 @@ def coherence_band(
     n_null=200,
     rng=None,
     mode="mean",         # "mean" oder "peak"
-    null_mode="flip"     # "flip", "phase" oder "both"
+    null_mode="flip",    # "flip", "phase", "both" oder "all"
+    batch_size=256,      # Surrogates pro gebatchtem Spektral-Aufruf
+    plan=None,           # optional: ogc.spectral.SpectralPlan (sonst aus dem LRU-Cache)
+    workers=None,        # None: serieller RNG-Strom; int: Chunks mit SeedSequence-Kindern
+    seq_h=None,          # sequentielles MC: Abbruch nach seq_h Überschreitungen (None = aus)
+    bands=None,          # optional: Liste [(f1, f2), ...] -> alle Bänder aus einem Surrogate-Durchlauf
+    fwer=False,          # mit bands: max-Statistik-p (familienweise) zusätzlich
+    dtype=None,          # None: float32-Eingaben bleiben float32, sonst float64; oder explizit
+    keep_nulls=False     # True: Null-Stichproben als result["nulls"] = {"flip": ..., "phase": ...}
 ):
     """
     Testet Band-Kohärenz via Surrogates.
     - null_mode="flip": y -> vorzeichenflip/permute (Phasenbezug zerstören, Spektrum ähnlich)
     - null_mode="phase": Phase-only Surrogates (Amplitude fix)
     - null_mode="both": beides und p_final = max(p_flip, p_phase) (konservativ)
+    - null_mode="all": beide Nulls je einmal; p_value_phase wie ein phase-Lauf,
+      p_value_flip wie ein both-Lauf (gleicher Seed), p_final = max (konservativ).
+      Ein Lauf liefert so die phase- und die both-Sicht zugleich.
+
+    Beide Nulls werden in Blöcken von batch_size Surrogates berechnet
+    (ein Spektral-Aufruf pro Block, beim Phase-Null zusätzlich ein irfft pro Block).
+    Die gebatchten Kernel runden in der letzten Stelle anders als die Einzelberechnung von
+    stat; Nulls bis TIE_ULPS ulp unter stat zählen deshalb als Bindung (null >= stat). Damit
+    stimmen die p-Werte mit der früheren Einzelschleife (_coherence_band_loop, Prüfung per
+    `ogc.cli t2-loop-check`) überein und hängen nicht von batch_size ab.
+    Fenster, Segmentierung, Band-Maske und die Segment-FFTs von x kommen aus einem
+    SpectralPlan, der für (len, fs, nperseg, band) nur einmal gebaut wird.
+    Ausgewertet werden nur die In-Band-Bins; bei schmalen Bändern wählt der Plan
+    automatisch eine kleine Band-DFT statt der vollen rfft.
+
+    workers=k (k >= 1) verteilt die Nulls in Chunks à batch_size Surrogates auf k Prozesse.
+    Jeder Chunk zieht aus seinem eigenen np.random.SeedSequence.spawn-Kind, die
+    Null-Verteilung ist daher für jede Worker-Zahl bitgleich (aber ein anderer Strom
+    als bei workers=None). x und y gehen per multiprocessing.shared_memory an die Worker.
+
+    seq_h=h schaltet sequentielles Monte Carlo (Besag–Clifford) ein: jeder Null stoppt,
+    sobald h Surrogates >= stat sind (dann p = h / n_used); klar nicht-signifikante
+    Seeds brauchen so nur einen Bruchteil von n_null. Ohne Abbruch wie bisher.
+
+    bands=[(f1, f2), ...] wertet jedes Surrogate-Spektrum einmal aus und reduziert es
+    gegen alle Band-Masken in einem Schritt (band wird dann ignoriert). Zusätzlich zu den
+    Skalarfeldern (= erstes Band) kommen Listen *_bands pro Band; fwer=True ergänzt
+    p_value_fwer_* aus der Verteilung des Maximums über die Bänder (max-T, single step).
+
+    dtype="float32" rechnet Surrogates, Segment-FFTs (complex64) und Kohärenz in float32;
+    der RNG-Strom bleibt gleich, p-Werte weichen nur bei knappen Vergleichen ab.
+
+    keep_nulls=True gibt die Null-Statistiken (in Ziehungsreihenfolge, bei seq_h gekürzt)
+    unter "nulls" mit zurück, z.B. für ogc.nullstore.save_nulls und spätere Neuberechnung.
 
     Rückgabe:
-      dict(stat, band_fraction, mode, null_mode, p_value_*, p_value_final, decision_alpha_0.05)
+      dict(stat, band_fraction, mode, null_mode, p_value_*, p_value_final, decision_alpha_0.05,
+           n_used_*, p_se_*)   # n_used = tatsächlich genutzte Surrogates, p_se = Binomial-SE von p
     """
     # RNG
     rng = np.random.default_rng(rng)
 
+    if dtype is None:
+        dtype = compute_dtype(x, y)
+    x = np.asarray(x, dtype=dtype)
+    y = np.asarray(y, dtype=dtype)
+
+    if bands is not None:
+        bands = [(float(lo), float(hi)) for lo, hi in bands]
+        if not bands:
+            raise ValueError("bands ist leer")
+        if seq_h:
+            raise ValueError("seq_h wird mit bands nicht unterstützt")
+        # Plan über das umschließende Band, die Teilbänder sind Masken auf dessen Bins
+        band = (min(b[0] for b in bands), max(b[1] for b in bands))
+
     # Auto nperseg (≈6 Segmente), minimal 128 und gerade
     if nperseg in (None, 0):
         L = min(len(x), len(y))
@@ -72,42 +386,68 @@ def coherence_band(
     if nperseg % 2 == 1:
         nperseg += 1
 
-    # beobachtete Statistik
-    stat_obs, band_frac = _stat_from_band(x, y, fs, nperseg, band, mode=mode)
+    if plan is None:
+        plan = get_plan(len(x), fs=fs, nperseg=nperseg, band=band, dtype=dtype)
+    elif not plan.matches(len(x), fs, nperseg, band, dtype=dtype):
+        raise ValueError("plan passt nicht zu (len(x), fs, nperseg, band, dtype); "
+                         "coherence_band rechnet mit noverlap = nperseg // 2 und Hann-Fenster")
 
-    # ---- Null 1: flip/permutation ----
-    p_flip = None
-    if null_mode in ("flip", "both"):
-        nulls = np.empty(n_null, dtype=float)
-        for i in range(n_null):
-            # einfache Phasenzerstörung durch zufälliges +/- und Zirkularshift
-            sign = -1.0 if rng.random() < 0.5 else 1.0
-            shift = rng.integers(0, len(y))
-            y_null = np.roll(sign * y, shift)
-            nulls[i], _ = _stat_from_band(x, y_null, fs, nperseg, band, mode=mode)
-        p_flip = float((nulls >= stat_obs).mean())
-
-    # ---- Null 2: phase-surrogates ----
-    p_phase = None
-    if null_mode in ("phase", "both"):
-        nulls = np.empty(n_null, dtype=float)
-        for i in range(n_null):
-            xs = _phase_surrogate(x, rng)
-            ys = _phase_surrogate(y, rng)
-            nulls[i], _ = _stat_from_band(xs, ys, fs, nperseg, band, mode=mode)
-        p_phase = float((nulls >= stat_obs).mean())
+    # beobachtete Statistik (x bleibt in beiden Nulls bzw. im Flip-Null fix -> Cache)
+    masks = None if bands is None else plan.sub_band_masks(bands)
+    C = plan.band_coherence(x, y, fixed_x=True)
+    stat_obs = _reduce(plan, C, mode, masks)
+    band_frac = plan.band_fraction
+    if masks is None:
+        stat_obs = float(stat_obs)
+    floor = _tie_floor(stat_obs, x.dtype)
+
+    step = max(1, int(batch_size))
+    kinds = [k for k in ("flip", "phase") if null_mode in (k, "both", "all")]
+    amps = None
+    if "phase" in kinds:
+        # Amplitudenspektren nur einmal; Phasen (x, y) pro Block in einem RNG-Aufruf
+        amps = np.abs(sp_fft.rfft(np.stack([x, y]), axis=-1))
+
+    nulls, p, n_used = {}, {}, {}
+    pool, shm = None, None
+    try:
+        if workers is None:
+            # "all": Phase-Null startet vom unverbrauchten RNG-Zustand (wie ein reiner phase-Lauf)
+            rngs = {"flip": rng, "phase": copy.deepcopy(rng) if null_mode == "all" else rng}
+            blocks = {k: _serial_blocks(k, rngs[k], n_null, step, mode, masks, x, y, amps, plan) for k in kinds}
+        else:
+            # feste Zuordnung: Kind 0 = flip, Kind 1 = phase (unabhängig von null_mode)
+            seeds = dict(zip(("flip", "phase"), _seed_sequence(rng).spawn(2)))
+            if int(workers) > 1:
+                xy = np.ascontiguousarray(np.stack([x, y]))
+                shm = shared_memory.SharedMemory(create=True, size=xy.nbytes)
+                np.ndarray(xy.shape, dtype=xy.dtype, buffer=shm.buf)[:] = xy
+                pool = ProcessPoolExecutor(max_workers=int(workers), initializer=_init_null_worker,
+                                           initargs=(shm.name, xy.shape[1], xy.dtype, plan))
+            blocks = {k: _chunked_blocks(k, seeds[k], n_null, step, mode, masks, pool, x, y, amps, plan) for k in kinds}
+        # ---- Null 1: flip/permutation, Null 2: phase-surrogates ----
+        for kind in kinds:
+            nulls[kind], p[kind], n_used[kind] = _collect_nulls(blocks[kind], stat_obs, seq_h=seq_h, floor=floor)
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+        if shm is not None:
+            shm.close()
+            shm.unlink()
+
+    if masks is not None:
+        out = _multi_band_result(bands, plan, stat_obs, nulls, p, n_used, mode, null_mode, fwer, floor)
+        if keep_nulls:
+            out["nulls"] = nulls
+        return out
+
+    p_flip = p.get("flip")
+    p_phase = p.get("phase")
 
     # Finales p
-    if null_mode == "flip":
-        p_final = p_flip
-    elif null_mode == "phase":
-        p_final = p_phase
-    else:
-        # konservativ: größeres p
-        vals = [v for v in (p_flip, p_phase) if v is not None]
-        p_final = float(max(vals)) if vals else None
+    p_final = _combine_p(null_mode, p_flip, p_phase)
 
-    return {
+    out = {
         "stat": float(stat_obs),
         "band_fraction": float(band_frac),
         "mode": mode,
@@ -116,4 +456,298 @@ def coherence_band(
         "p_value_phase": p_phase,
         "p_value_final": p_final,
         "decision_alpha_0.05": (p_final is not None and p_final < 0.05),
+        "seq_h": seq_h,
+        "n_used_flip": n_used.get("flip"),
+        "n_used_phase": n_used.get("phase"),
+        "p_se_flip": _p_se(p_flip, n_used.get("flip")),
+        "p_se_phase": _p_se(p_phase, n_used.get("phase")),
+    }
+    if keep_nulls:
+        out["nulls"] = nulls
+    return out
+
+class CoherenceAccumulator:
+    """
+    Streaming-Welch/CSD für beliebig lange Signale: Chunks von x und y über update(),
+    laufende Summen von Pxx, Pyy und Pxy über alle vollständigen Segmente.
+    Gepuffert werden nur die Samples ab dem nächsten Segmentstart (< nperseg),
+    der Speicher ist also O(nperseg) (plus aktueller Chunk), unabhängig von der Länge.
+    Segmentierung, Fenster, Detrend und Skalierung wie _mscoh / coherence_band;
+    das Ergebnis entspricht der Batch-Schätzung bis auf die Summationsreihenfolge.
+
+    Nulls auf Blockebene (n_null > 0), als laufende Summen auf den Band-Bins:
+      - "flip":  zufälliges Vorzeichen pro Block auf y (Pxx, Pyy unverändert)
+      - "phase": zufällige Phase pro Block im Kreuzspektrum
+    Ein Block sind null_block aufeinanderfolgende Segmente (Default: NULL_BLOCK_SPANS
+    Segmentlängen, bei 50 % Overlap 8 Segmente). Ein Gewicht pro Segment wäre bei
+    überlappenden Segmenten antikonservativ (α=0.1: ~14 % Ablehnungen unter H0), weil die
+    Korrelation benachbarter Segmente im Null verloren geht; mit Blöcken bleibt sie bis auf
+    die Blockränder erhalten (gemessen 9.8–10.8 % bei 800 Wiederholungen).
+    Der Null hat nur so viele unabhängige Gewichte wie Blöcke: bei kurzen Strömen (wenige
+    Blöcke) ist er grob diskret. Der p-Wert ist ein anderer Test als der Batch-p von
+    coherence_band (Sign/Shift bzw. Phasen über das ganze Signal), nicht austauschbar.
+    Die Zufallszahlen werden blockweise gezogen (Flip: SeedSequence-Kind 0,
+    Phase: Kind 1), das Ergebnis hängt daher nicht von den Chunk-Grenzen ab.
+    """
+
+    def __init__(self, fs=1.0, nperseg=256, band=None, noverlap=None, n_null=0, null_mode="flip",
+                 rng=None, mode="mean", dtype="float64", null_block=None):
+        if null_mode not in ("flip", "phase", "both", "all"):
+            raise ValueError('null_mode must be "flip", "phase", "both" or "all"')
+        self.nperseg = int(nperseg)
+        self.noverlap = self.nperseg // 2 if noverlap is None else min(int(noverlap), max(0, self.nperseg - 1))
+        self.step = self.nperseg - self.noverlap
+        # Segmente pro Zufallsblock; Default: so viele, dass sich benachbarte Blöcke nur am Rand überlappen
+        self.null_block = int(null_block) if null_block else NULL_BLOCK_SPANS * -(-self.nperseg // self.step)
+        self.mode = mode
+        self.null_mode = null_mode
+        self.n_null = int(n_null)
+        self.dtype = np.dtype(dtype)
+        # Plan über genau ein Segment: liefert Fenster, Skalierung, Band-Bins und Band-DFT
+        self.plan = get_plan(self.nperseg, fs=fs, nperseg=self.nperseg, band=band, dtype=self.dtype)
+        k = self.plan.band_bins.size
+
+        self.n_samples = 0
+        self.n_seg = 0
+        self._buf = np.empty((2, 0), dtype=self.dtype)
+        self._sxx = np.zeros(k)
+        self._syy = np.zeros(k)
+        self._sxy = np.zeros(k, dtype=complex)
+
+        self._kinds = [c for c in ("flip", "phase") if self.n_null > 0 and null_mode in (c, "both", "all")]
+        seeds = dict(zip(("flip", "phase"), _seed_sequence(rng).spawn(2)))
+        self._rngs = {c: np.random.default_rng(seeds[c]) for c in self._kinds}
+        self._snull = {c: np.zeros((self.n_null, k), dtype=complex) for c in self._kinds}
+        self._w = {c: None for c in self._kinds}   # Gewichte des aktuellen Blocks (n_null,)
+
+    def update(self, x, y):
+        """
+        Nächsten Chunk (gleich lang für x und y) verarbeiten; gibt die Zahl neuer Segmente zurück.
+        """
+        xy = np.asarray([x, y], dtype=self.dtype)
+        self.n_samples += xy.shape[1]
+        data = np.concatenate([self._buf, xy], axis=1)
+        L = data.shape[1]
+        nseg = 0 if L < self.nperseg else (L - self.nperseg) // self.step + 1
+        if nseg:
+            segs = segment_view(data, self.nperseg, self.noverlap)[:, :nseg]
+            # (2, nseg, 1, nperseg) -> (2, nseg, k): ein Segment pro Zeile durch den Plan
+            F = self.plan.band_fft(segs)[..., 0, :]
+            cross = np.conjugate(F[0]) * F[1]
+            self._sxx += (F[0].real**2 + F[0].imag**2).sum(axis=0)
+            self._syy += (F[1].real**2 + F[1].imag**2).sum(axis=0)
+            self._sxy += cross.sum(axis=0)
+            # Blockindex jedes neuen Segments (global gezählt -> unabhängig von Chunk-Grenzen)
+            blk = np.arange(self.n_seg, self.n_seg + nseg) // self.null_block
+            first = self.n_seg // self.null_block
+            n_new = int(blk[-1] - first) + (self.n_seg % self.null_block == 0)
+            for kind in self._kinds:
+                # ein Gewicht pro Block und Surrogate, Block für Block aus dem Strom gezogen
+                if kind == "flip":
+                    w = np.where(self._rngs[kind].random((n_new, self.n_null)) < 0.5, -1.0, 1.0)
+                else:
+                    w = np.exp(1j * self._rngs[kind].uniform(0, 2*np.pi, size=(n_new, self.n_null)))
+                if self.n_seg % self.null_block:
+                    # laufender Block aus dem vorigen update
+                    w = np.concatenate([self._w[kind][None, :], w])
+                self._snull[kind] += w[blk - first].T @ cross
+                self._w[kind] = w[-1]
+            self.n_seg += nseg
+        self._buf = data[:, nseg * self.step:].copy()
+        return nseg
+
+    def spectra(self):
+        """
+        (f, Pxx, Pyy, Pxy) auf den Band-Bins (ohne band: alle Bins) über alle bisherigen Segmente.
+        """
+        if not self.n_seg:
+            raise ValueError("noch kein vollständiges Segment")
+        scale = self.plan.scale[self.plan.band_bins] / self.n_seg
+        f = self.plan.freqs[self.plan.band_bins]
+        return f, self._sxx * scale, self._syy * scale, self._sxy * scale
+
+    def _coh(self, Pxx, Pyy, Pxy):
+        C = (np.abs(Pxy) ** 2) / (Pxx * Pyy + 1e-12)
+        return np.clip(C.real, 0.0, 1.0)
+
+    def coherence(self):
+        f, Pxx, Pyy, Pxy = self.spectra()
+        return f, self._coh(Pxx, Pyy, Pxy)
+
+    def result(self):
+        """
+        dict wie coherence_band (stat, p_value_*, ...) plus n_seg und n_samples.
+        """
+        f, Pxx, Pyy, Pxy = self.spectra()
+        stat_obs = float(self.plan.band_stat(self._coh(Pxx, Pyy, Pxy), mode=self.mode))
+        scale = self.plan.scale[self.plan.band_bins] / self.n_seg
+        p = {}
+        for kind in self._kinds:
+            nulls = self.plan.band_stat(self._coh(Pxx, Pyy, self._snull[kind] * scale), mode=self.mode)
+            p[kind] = float((nulls >= _tie_floor(stat_obs, self.plan.dtype)).mean())
+        p_final = _combine_p(self.null_mode, p.get("flip"), p.get("phase"))
+        return {
+            "stat": stat_obs,
+            "band_fraction": self.plan.band_fraction,
+            "mode": self.mode,
+            "null_mode": self.null_mode,
+            "p_value_flip": p.get("flip"),
+            "p_value_phase": p.get("phase"),
+            "p_value_final": p_final,
+            "decision_alpha_0.05": (p_final is not None and p_final < 0.05),
+            "n_seg": self.n_seg,
+            "n_samples": self.n_samples,
+        }
+
+def coherence_band_stream(chunks, fs=1.0, band=(0.7, 0.9), nperseg=256, n_null=200, rng=None,
+                          mode="mean", null_mode="flip", dtype="float64", null_block=None):
+    """
+    coherence_band für einen Strom von (x_chunk, y_chunk)-Paaren über CoherenceAccumulator.
+    """
+    acc = CoherenceAccumulator(fs=fs, nperseg=nperseg, band=band, n_null=n_null, null_mode=null_mode,
+                               rng=rng, mode=mode, dtype=dtype, null_block=null_block)
+    for x, y in chunks:
+        acc.update(x, y)
+    return acc.result()
+
+def _pair_blocks(N, block):
+    # obere Dreiecks-Blöcke (I, J) mit J >= I
+    starts = range(0, N, block)
+    return [(slice(i, min(i + block, N)), slice(j, min(j + block, N))) for i in starts for j in starts if j >= i]
+
+def _matrix_stats(plan, F, P, scale, I, J, mode):
+    """
+    Band-Statistik aller Paare (i in I, j in J) aus Segment-Spektren F (…, N, nseg, k)
+    und Autospektren P (…, N, k): Kreuzspektren per einsum, Ergebnis (…, |I|, |J|).
+    """
+    Pxy = np.einsum("...isf,...jsf->...ijf", np.conjugate(F[..., I, :, :]), F[..., J, :, :]) * scale
+    C = (np.abs(Pxy) ** 2) / (P[..., I, None, :] * P[..., None, J, :] + 1e-12)
+    return plan.band_stat(np.clip(C.real, 0.0, 1.0), mode=mode)
+
+def _channel_surrogates(kind, seqs, b, X, amps, chans):
+    """
+    (b, |chans|, n) Surrogates der Kanäle chans; Kanal c zieht aus einem frischen Generator
+    über seqs[c]. Derselbe Kanal liefert so in jedem Paar-Block dieselben Surrogates, und
+    das Ergebnis hängt nicht von block ab. Speicher O(b · |chans| · n).
+    """
+    n = X.shape[1]
+    S = np.empty((b, chans.stop - chans.start, n), dtype=X.dtype)
+    t = np.arange(n)
+    for i, c in enumerate(range(chans.start, chans.stop)):
+        g = np.random.default_rng(seqs[c])
+        if kind == "flip":
+            signs = np.where(g.random(b) < 0.5, -1.0, 1.0).astype(X.dtype)
+            shifts = g.integers(0, n, size=b)
+            S[:, i] = signs[:, None] * X[c][(t[None, :] - shifts[:, None]) % n]
+        else:
+            S[:, i] = _phase_surrogate_block(amps[c:c + 1], n, b, g)[:, 0]
+    return S
+
+def coherence_matrix(
+    X,
+    fs=1.0,
+    band=(0.7, 0.9),
+    nperseg=0,           # 0 / None => auto (wie coherence_band)
+    n_null=200,
+    rng=None,
+    mode="mean",         # "mean" oder "peak"
+    null_mode="phase",   # "flip", "phase" oder "both"
+    batch_size=16,       # Surrogates pro Block (alle Kanäle gemeinsam)
+    block=64,            # Kanäle pro Paar-Block
+    dtype=None
+):
+    """
+    Band-Kohärenz aller Kanalpaare von X (N, n) in einem Durchlauf.
+
+    Die Welch-Segmente jedes Kanals werden einmal transformiert (nur Band-Bins, über
+    denselben SpectralPlan wie coherence_band); die Kreuzspektren aller Paare eines
+    Paar-Blocks entstehen in einem einsum. Speicher für die Paare ist daher
+    O(batch_size · block² · k) statt O(N² · k).
+
+    Nulls mit gemeinsamen Surrogates: pro Surrogate bekommt jeder Kanal
+      - "flip":  eigenes Vorzeichen und eigenen Zirkularshift,
+      - "phase": eigene Phase-only-Randomisierung (Amplitude fix),
+    ein Surrogate-Satz aus N Signalen bedient so alle N² Paare. Surrogates entstehen pro
+    Kanal-Block passend zu den Paar-Blöcken (jeder Kanal mit eigenem SeedSequence-Kind pro
+    Surrogate-Batch, daher bei Bedarf neu erzeugbar); im Speicher liegen nur die Surrogates
+    der zwei Kanal-Blöcke eines Paar-Blocks, O(batch_size · block · n), unabhängig von N.
+    Die p-Werte hängen nicht von block ab (wohl aber von batch_size über die Seed-Zuordnung).
+    p = Anteil der Surrogates mit stat_null >= stat (pro Paar); "both" -> max (konservativ).
+
+    Rückgabe:
+      dict(stat (N, N), p_value_flip, p_value_phase, p_value_final (N, N) oder None,
+           band_fraction, mode, null_mode, n_null); Diagonale: stat 1, p NaN.
+    """
+    if null_mode not in ("flip", "phase", "both"):
+        raise ValueError('null_mode must be "flip", "phase" or "both"')
+    root = _seed_sequence(rng)
+    if dtype is None:
+        dtype = compute_dtype(X)
+    X = np.asarray(X, dtype=dtype)
+    if X.ndim != 2:
+        raise ValueError("X muss die Form (Kanäle, Samples) haben")
+    N, n = X.shape
+
+    if nperseg in (None, 0):
+        nperseg = max(128, n // 6)
+    if nperseg % 2 == 1:
+        nperseg += 1
+    plan = get_plan(n, fs=fs, nperseg=nperseg, band=band, dtype=dtype)
+    scale = plan.scale[plan.band_bins] / plan.nseg
+    block = max(1, int(block))
+    pairs = _pair_blocks(N, block)
+
+    # beobachtet: eine Segment-FFT pro Kanal
+    F = plan.band_fft(X)
+    P = plan.auto_spectrum(F, band=True)
+    stat = np.empty((N, N))
+    for I, J in pairs:
+        stat[I, J] = _matrix_stats(plan, F, P, scale, I, J, mode)
+        stat[J, I] = stat[I, J].T
+    floor = _tie_floor(stat, X.dtype)
+
+    kinds = [k for k in ("flip", "phase") if null_mode in (k, "both")]
+    amps = np.abs(sp_fft.rfft(X, axis=-1)) if "phase" in kinds else None
+    step = max(1, int(batch_size))
+    sizes = [min(step, int(n_null) - lo) for lo in range(0, int(n_null), step)]
+    # feste Zuordnung: Kind 0 = flip, Kind 1 = phase; darunter ein Kind pro Batch, darunter pro Kanal
+    batch_seqs = dict(zip(("flip", "phase"), (s.spawn(len(sizes)) for s in root.spawn(2))))
+    p = {}
+    for kind in kinds:
+        exceed = np.zeros((N, N), dtype=np.int64)
+        for bs, b in zip(batch_seqs[kind], sizes):
+            seqs = bs.spawn(N)
+            rows = None
+            for I, J in pairs:
+                # Zeilen-Block einmal pro I rechnen, Spalten-Block pro Paar-Block dazunehmen
+                if rows is None or rows[0] != I:
+                    Fi = plan.band_fft(_channel_surrogates(kind, seqs, b, X, amps, I))
+                    rows = (I, Fi, plan.auto_spectrum(Fi, band=True))
+                _, Fs, Ps = rows
+                ni = I.stop - I.start
+                Jl = slice(0, ni)
+                if J != I:
+                    Fj = plan.band_fft(_channel_surrogates(kind, seqs, b, X, amps, J))
+                    Fs = np.concatenate([Fs, Fj], axis=-3)
+                    Ps = np.concatenate([Ps, plan.auto_spectrum(Fj, band=True)], axis=-2)
+                    Jl = slice(ni, None)
+                hit = (_matrix_stats(plan, Fs, Ps, scale, slice(0, ni), Jl, mode) >= floor[I, J]).sum(axis=0)
+                exceed[I, J] += hit
+                if J != I:
+                    exceed[J, I] += hit.T
+        pk = exceed / float(n_null) if n_null else np.full((N, N), np.nan)
+        np.fill_diagonal(pk, np.nan)
+        p[kind] = pk
+    np.fill_diagonal(stat, 1.0)
+
+    p_final = _combine_p(null_mode, p.get("flip"), p.get("phase"))
+    return {
+        "stat": stat,
+        "band_fraction": plan.band_fraction,
+        "mode": mode,
+        "null_mode": null_mode,
+        "n_null": int(n_null),
+        "p_value_flip": p.get("flip"),
+        "p_value_phase": p.get("phase"),
+        "p_value_final": p_final,
     }
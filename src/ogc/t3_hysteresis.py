@@ -1,31 +1,129 @@
-# ogc/tests/t3_hysteresis.py
+# ogc/t3_hysteresis.py
 
 import numpy as np
-from typing import Dict, Any, Tuple
-from scipy.signal import welch, csd
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, Optional, Tuple
+from ogc.nulls import phase_only_surrogates
+from ogc.spectral import BandQuery, SpectralPlan, get_plan, welch_spectra
 
-def _mscoh(x: np.ndarray, y: np.ndarray, fs: float, nperseg: int) -> Tuple[np.ndarray, np.ndarray]:
+# np.trapz heißt seit numpy 2.0 np.trapezoid (der alte Name ist inzwischen entfernt)
+_trapz = getattr(np, "trapezoid", None) or np.trapz
+
+def _mscoh(x: np.ndarray, y: np.ndarray, fs: float, nperseg: int, plan: Optional[SpectralPlan] = None) -> Tuple[np.ndarray, np.ndarray]:
     """
     Magnitude-squared coherence via Welch estimates:
       Cxy(f) = |Pxy|^2 / (Pxx * Pyy)
+    Mit plan werden die Segment-FFTs von x und y (fix über den Sweep) gecacht.
     Rückgabe: (f, Cxy)
     """
+    if plan is not None:
+        return plan.coherence(x, y, fixed_x=True, fixed_y=True)
     noverlap = max(0, nperseg // 2)
-    f, Pxx = welch(x, fs=fs, nperseg=nperseg, noverlap=noverlap, detrend="constant")
-    _, Pyy = welch(y, fs=fs, nperseg=nperseg, noverlap=noverlap, detrend="constant")
-    _, Pxy = csd(x, y, fs=fs, nperseg=nperseg, noverlap=noverlap, detrend="constant")
+    f, Pxx, Pyy, Pxy = welch_spectra(x, y, fs=fs, nperseg=nperseg, noverlap=noverlap, detrend="constant")
     C = (np.abs(Pxy) ** 2) / (Pxx * Pyy + 1e-12)
     C = np.clip(C.real, 0.0, 1.0)
     return f, C
 
-def _band_stat(x: np.ndarray, y: np.ndarray, fs: float, band: Tuple[float, float], nperseg: int, mode: str = "mean") -> float:
-    f, C = _mscoh(x, y, fs=fs, nperseg=nperseg)
+def _band_stat(x: np.ndarray, y: np.ndarray, fs: float, band: Tuple[float, float], nperseg: int, mode: str = "mean",
+               plan: Optional[SpectralPlan] = None) -> float:
+    f, C = _mscoh(x, y, fs=fs, nperseg=nperseg, plan=plan)
     mask = (f >= band[0]) & (f <= band[1])
     if not mask.any():
         return 0.0
     Cb = C[mask]
     return float(Cb.max() if mode == "peak" else Cb.mean())
 
+def _sweep_bands(u: np.ndarray, sweep: str, f1: float, f2: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Bandkanten (lo, hi) für alle Sweep-Werte u auf einmal.
+    """
+    u = np.asarray(u, dtype=float)
+    if sweep == "low_edge":
+        return u, np.full_like(u, f2)
+    if sweep == "high_edge":
+        return np.full_like(u, f1), u
+    # "width"
+    width = (f2 - f1) * u
+    mid = 0.5 * (f1 + f2)
+    return mid - 0.5 * width, mid + 0.5 * width
+
+def _loop_areas(f, C, u_grid, sweep, f1, f2, mode):
+    """
+    A_loop für ein Spektrum C (nfreq) oder gebatcht C (B, nfreq): alle Sweep-Schritte
+    vorwärts und rückwärts als Bandabfragen, Integration entlang der letzten Achse.
+    """
+    q = BandQuery(f, C)
+    forward = q.stats(*_sweep_bands(u_grid, sweep, f1, f2), mode=mode)
+    backward = q.stats(*_sweep_bands(u_grid[::-1], sweep, f1, f2), mode=mode)
+    return _trapz(np.abs(forward - backward), u_grid, axis=-1)
+
+def _shift_surrogates(y: np.ndarray, n_surr: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    (n_surr, n) zirkulär verschobene Kopien von y, Shift gleichverteilt in [1, n-1].
+    """
+    n = len(y)
+    shifts = rng.integers(1, max(2, n), size=n_surr)
+    return y[(np.arange(n)[None, :] - shifts[:, None]) % n]
+
+def _loop_null_chunk(null, seed_seq, n_surr, x, y, u_grid, sweep, f1, f2, mode, fs, nperseg):
+    rng = np.random.default_rng(seed_seq)
+    plan = get_plan(len(x), fs=fs, nperseg=nperseg)
+    if null == "shift":
+        # x bleibt fest (gecachte Segment-FFTs), nur y wird verschoben
+        f, C = plan.coherence(x, _shift_surrogates(y, n_surr, rng), fixed_x=True)
+    else:
+        xs = phase_only_surrogates(x, n_surr, rng=rng)
+        ys = phase_only_surrogates(y, n_surr, rng=rng)
+        f, C = plan.coherence(xs, ys)
+    return _loop_areas(f, C, u_grid, sweep, f1, f2, mode)
+
+def loop_area_null(
+    x: np.ndarray,
+    y: np.ndarray,
+    A_obs: float,
+    u_grid: np.ndarray,
+    fs: float,
+    nperseg: int,
+    base_band: Tuple[float, float],
+    sweep: str = "low_edge",
+    mode: str = "mean",
+    n_null: int = 200,
+    null: str = "phase",      # "phase" | "shift"
+    rng=None,
+    batch_size: int = 256,
+    workers: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Surrogate-Test für A_loop:
+      - null="phase": x und y unabhängig phasenrandomisiert (Amplituden erhalten),
+      - null="shift": y zirkulär gegen x verschoben.
+    Pro Block von batch_size Surrogates ein gebatchtes Kohärenzspektrum (B, nfreq);
+    alle Sweep-Schritte aller Surrogates sind dann Bandabfragen ohne Python-Schleife.
+    Block j nutzt SeedSequence.spawn(...)[j] der rng -> gleiches Ergebnis für jede workers-Zahl.
+    p = Anteil der Surrogates mit A_null >= A_obs.
+    """
+    if null not in ("phase", "shift"):
+        raise ValueError('null must be "phase" or "shift"')
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    u_grid = np.asarray(u_grid, dtype=float)
+    f1, f2 = base_band
+    n_null = int(n_null)
+    step = max(1, int(batch_size))
+    sizes = [min(step, n_null - lo) for lo in range(0, n_null, step)]
+    ss = rng if isinstance(rng, np.random.SeedSequence) else np.random.default_rng(rng).bit_generator.seed_seq
+    children = np.random.SeedSequence(ss.entropy, spawn_key=ss.spawn_key).spawn(len(sizes))
+    args = (x, y, u_grid, sweep, f1, f2, mode, fs, nperseg)
+    if workers is not None and int(workers) > 1 and len(sizes) > 1:
+        with ProcessPoolExecutor(max_workers=min(int(workers), len(sizes))) as pool:
+            futs = [pool.submit(_loop_null_chunk, null, c, b, *args) for c, b in zip(children, sizes)]
+            parts = [fu.result() for fu in futs]
+    else:
+        parts = [_loop_null_chunk(null, c, b, *args) for c, b in zip(children, sizes)]
+    nulls = np.concatenate(parts) if parts else np.empty(0)
+    p = float((nulls >= A_obs).mean()) if nulls.size else None
+    return {"p_value_A_loop": p, "n_null_A_loop": int(nulls.size), "null_A_loop": null}
+
 def hysteresis_loop(
     n: int = 300,
     u_min: float = 0.5,
@@ -38,6 +136,11 @@ def hysteresis_loop(
     n_steps: int = 21,
     sweep: str = "low_edge",  # "low_edge" | "high_edge" | "width"
     mode: str = "mean",       # "mean" | "peak"
+    plan: Optional[SpectralPlan] = None,
+    n_null: int = 0,
+    null: str = "phase",      # "phase" | "shift"
+    workers: Optional[int] = None,
+    batch_size: int = 256,
 ) -> Dict[str, Any]:
     """
     T3 Hysterese-Test:
@@ -55,6 +158,10 @@ def hysteresis_loop(
         "sweep": "low_edge" | "high_edge" | "width",
         "mode": "mean" | "peak"
       }
+
+    plan: optionaler SpectralPlan für (n, fs, nperseg); sonst aus dem LRU-Cache.
+    n_null > 0: zusätzlich Surrogate-Test für A_loop (siehe loop_area_null) ->
+      "p_value_A_loop", "n_null_A_loop", "null_A_loop"; Surrogates aus SeedSequence(seed).
     """
     rng = np.random.default_rng(seed)
 
@@ -64,44 +171,30 @@ def hysteresis_loop(
     x = np.sin(2*np.pi*0.8*t) + noise * rng.standard_normal(n)
     y = np.sin(2*np.pi*0.8*t + 0.25) + noise * rng.standard_normal(n)
 
+    if plan is None:
+        plan = get_plan(n, fs=fs, nperseg=nperseg)
+    elif plan.n != n or plan.fs != float(fs) or plan.nperseg != min(nperseg, n):
+        raise ValueError("plan passt nicht zu (n, fs, nperseg)")
+
     # Parameter-Gitter
     u_grid = np.linspace(u_min, u_max, n_steps)
 
     f1, f2 = base_band
-    forward, backward = [], []
+
+    # Kohärenzspektrum nur einmal; jeder Sweep-Schritt ist dann eine O(1)-Bandabfrage
+    f, C = _mscoh(x, y, fs=fs, nperseg=nperseg, plan=plan)
+    q = BandQuery(f, C)
 
     # Vorwärts-Sweep
-    for u in u_grid:
-        if sweep == "low_edge":
-            band = (u, f2)
-        elif sweep == "high_edge":
-            band = (f1, u)
-        else:  # "width"
-            width = (f2 - f1) * u
-            mid = 0.5 * (f1 + f2)
-            band = (mid - 0.5 * width, mid + 0.5 * width)
-        val = _band_stat(x, y, fs=fs, band=band, nperseg=nperseg, mode=mode)
-        forward.append(val)
+    forward = q.stats(*_sweep_bands(u_grid, sweep, f1, f2), mode=mode)
 
     # Rückwärts-Sweep
-    for u in u_grid[::-1]:
-        if sweep == "low_edge":
-            band = (u, f2)
-        elif sweep == "high_edge":
-            band = (f1, u)
-        else:
-            width = (f2 - f1) * u
-            mid = 0.5 * (f1 + f2)
-            band = (mid - 0.5 * width, mid + 0.5 * width)
-        val = _band_stat(x, y, fs=fs, band=band, nperseg=nperseg, mode=mode)
-        backward.append(val)
-
-    forward = np.asarray(forward, dtype=float)
-    backward = np.asarray(backward, dtype=float)
+    backward = q.stats(*_sweep_bands(u_grid[::-1], sweep, f1, f2), mode=mode)
+
     # Fläche zwischen den Kurven (numerische Integration)
-    A_loop = float(np.trapz(np.abs(forward - backward), u_grid))
+    A_loop = float(_trapz(np.abs(forward - backward), u_grid))
 
-    return {
+    res = {
         "forward": forward.tolist(),
         "backward": backward.tolist(),
         "u_grid": u_grid.tolist(),
@@ -116,5 +209,12 @@ def hysteresis_loop(
         "seed": int(seed),
         "noise": float(noise),
     }
+    if n_null > 0:
+        # eigener Zweig der Seed-Sequenz, unabhängig vom Synthese-Rauschen
+        res.update(loop_area_null(x, y, A_loop, u_grid, fs=fs, nperseg=nperseg, base_band=base_band,
+                                  sweep=sweep, mode=mode, n_null=n_null, null=null,
+                                  rng=np.random.SeedSequence(seed).spawn(1)[0],
+                                  batch_size=batch_size, workers=workers))
+    return res
 
 
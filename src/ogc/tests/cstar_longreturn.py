@@ -1,21 +1,233 @@
+import json
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
 import numpy as np
+from scipy import fft as sp_fft
+
+def _lag_sums(x, max_lag):
+    """
+    sum(x[:-lag] * x[lag:]) für lag = 1..max_lag über zero-padded FFT (entlang der letzten Achse).
+    """
+    n = x.shape[-1]
+    nfft = sp_fft.next_fast_len(n + max_lag, real=True)
+    X = sp_fft.rfft(x, n=nfft, axis=-1)
+    return sp_fft.irfft(X.real**2 + X.imag**2, n=nfft, axis=-1)[..., 1:max_lag+1]
+
+def _acf(x, max_lag):
+    """
+    ACF für lag = 1..max_lag über zero-padded FFT, entlang der letzten Achse (auch gebatcht).
+    Gleich sum(x[:-lag] * x[lag:]) / (n - lag), aber O(n log n) statt O(n·max_lag).
+    """
+    return _lag_sums(x, max_lag) / (x.shape[-1] - np.arange(1, max_lag+1))
 
-def cstar_return_indicator(count_series, max_lag=200, rng=0):
+def _block_shuffle_index(rnd, n, block, n_boot):
+    """
+    (n_boot, n) Gather-Index der Block-Shuffle-Surrogates.
+    Pro Surrogate eine rnd.permutation(n_blocks) – dieselbe Ziehung wie rnd.shuffle
+    auf der Blockliste; ein kürzerer letzter Block wird beim Gather herausgefiltert.
+    """
+    n_blocks = -(-n // block)
+    perms = np.array([rnd.permutation(n_blocks) for _ in range(n_boot)]).reshape(n_boot, n_blocks)
+    idx = (perms[..., None] * block + np.arange(block)).reshape(n_boot, -1)
+    return idx[idx < n].reshape(n_boot, n)
+
+def _block_null(x, max_lag, rnd, n_boot, batch_size=256):
+    """
+    C*-Statistiken von n_boot Block-Shuffle-Surrogates des (normierten) x.
+    Blockweise (batch_size Zeilen): ein Gather, eine gebatchte FFT pro Block.
+    """
+    B, block = int(n_boot), max(5, max_lag//10)
+    stats_null = np.empty(B)
+    for lo in range(0, B, batch_size):
+        b = min(batch_size, B - lo)
+        xs = x[_block_shuffle_index(rnd, len(x), block, b)]
+        stats_null[lo:lo+b] = _acf(xs, max_lag)[:, int(max_lag*0.5):].mean(axis=1)
+    return stats_null
+
+def cstar_return_indicator(count_series, max_lag=200, rng=0, n_boot=200, batch_size=256):
     x = np.array(count_series, dtype=float)
     x = (x - x.mean()) / (x.std() + 1e-12)
-    acf = np.array([np.dot(x[:-lag], x[lag:]) / (len(x)-lag) for lag in range(1, max_lag+1)])
+    acf = _acf(x, max_lag)
     stat_obs = float(np.mean(acf[int(max_lag*0.5):]))
 
     rnd = np.random.default_rng(rng)
-    B, block = 200, max(5, max_lag//10)
-    stats_null = []
-    for _ in range(B):
-        blocks = [x[i:i+block] for i in range(0, len(x), block)]
-        rnd.shuffle(blocks)
-        xs = np.concatenate(blocks)[:len(x)]
-        acf_s = np.array([np.dot(xs[:-lag], xs[lag:]) / (len(xs)-lag) for lag in range(1, max_lag+1)])
-        stats_null.append(float(np.mean(acf_s[int(max_lag*0.5):])))
-    stats_null = np.array(stats_null)
+    stats_null = _block_null(x, max_lag, rnd, n_boot, batch_size)
     p_right = float((stats_null >= stat_obs).mean())
     return {"stat": stat_obs, "p_value": p_right, "tail_mean_acf": float(acf.mean())}
 
+class CStarMonitor:
+    """
+    Gleitendes C* über einen unbegrenzten Zählstrom (Fenster der letzten window Samples).
+
+    Ringpuffer plus laufende Summen sum(z_t * z_{t+lag}) für lag = 1..max_lag, Summe und
+    Quadratsumme der Rohwerte; update() kostet O(max_lag). Die Normierung
+    (z - mean) / (std + 1e-12) des Fensters wird erst bei stat() aus den Summen
+    eingerechnet, das Ergebnis entspricht cstar_return_indicator auf dem Fenster.
+    Bei jedem Null-Refresh werden die laufenden Summen exakt aus dem Puffer neu
+    aufgesetzt (keine Drift bei nicht-ganzzahligen Werten).
+
+    Alle refresh_every Samples wird der Block-Bootstrap-Null (n_boot Surrogates)
+    auf einer Kopie des Fensters neu gerechnet – im Hintergrund-Thread
+    (background=True) oder synchron (reproduzierbar für Tests/Replays).
+    p_value() vergleicht die aktuelle Statistik mit dem letzten fertigen Null.
+    """
+
+    def __init__(self, window=8000, max_lag=400, n_boot=200, refresh_every=1000, rng=0, background=True):
+        self.window = int(window)
+        self.max_lag = int(max_lag)
+        if self.window <= self.max_lag:
+            raise ValueError("window muss größer als max_lag sein")
+        self.n_boot = int(n_boot)
+        self.refresh_every = int(refresh_every)
+        self._rnd = np.random.default_rng(rng)
+        self._lags = np.arange(1, self.max_lag + 1)
+
+        self._buf = np.zeros(self.window)
+        self._start = 0
+        self.n = 0             # Samples im Fenster
+        self.n_seen = 0        # Samples insgesamt
+        self._S = np.zeros(self.max_lag)
+        self._sum = 0.0
+        self._sumsq = 0.0
+
+        self._null = None      # (stats_null, n_seen beim Snapshot)
+        self._pending = None
+        self._pool = ThreadPoolExecutor(max_workers=1) if background else None
+
+    # ---- Ringpuffer ----
+    def _at(self, pos):
+        return self._buf[(self._start + pos) % self.window]
+
+    def values(self):
+        """
+        Aktuelles Fenster in zeitlicher Reihenfolge (Kopie).
+        """
+        return self._at(np.arange(self.n))
+
+    def update(self, z):
+        z = float(z)
+        if self.n == self.window:
+            # ältestes Sample samt seiner Paare (old, old+lag) entfernen
+            old = self._buf[self._start]
+            self._S -= old * self._at(self._lags)
+            self._sum -= old
+            self._sumsq -= old * old
+            self._start = (self._start + 1) % self.window
+            self.n -= 1
+        # neue Paare (z - lag, z)
+        pos = self.n - self._lags
+        ok = pos >= 0
+        self._S[ok] += z * self._at(pos[ok])
+        self._buf[(self._start + self.n) % self.window] = z
+        self.n += 1
+        self.n_seen += 1
+        self._sum += z
+        self._sumsq += z * z
+        if self.refresh_every and self.n_seen % self.refresh_every == 0 and self.n > self.max_lag:
+            self.refresh()
+
+    def extend(self, values):
+        for z in np.asarray(values, dtype=float).ravel():
+            self.update(z)
+
+    # ---- Statistik ----
+    def acf(self):
+        """
+        ACF (lag 1..max_lag) des normierten Fensters aus den laufenden Summen; None vor max_lag+1 Samples.
+        """
+        n, L = self.n, self.max_lag
+        if n <= L:
+            return None
+        mu = self._sum / n
+        sd = np.sqrt(max(self._sumsq / n - mu * mu, 0.0)) + 1e-12
+        head = np.cumsum(self._at(np.arange(L)))            # z_0 .. z_{lag-1}
+        tail = np.cumsum(self._at(n - 1 - np.arange(L)))    # z_{n-lag} .. z_{n-1}
+        a = self._sum - tail      # sum z_0 .. z_{n-lag-1}
+        b = self._sum - head      # sum z_lag .. z_{n-1}
+        m = n - self._lags
+        return (self._S - mu * (a + b) + m * mu * mu) / (sd * sd) / m
+
+    def stat(self):
+        acf = self.acf()
+        return None if acf is None else float(np.mean(acf[int(self.max_lag*0.5):]))
+
+    # ---- Null ----
+    def _compute_null(self, z, t):
+        x = (z - z.mean()) / (z.std() + 1e-12)
+        return _block_null(x, self.max_lag, self._rnd, self.n_boot), t
+
+    def refresh(self):
+        """
+        Laufende Summen exakt neu aufsetzen und einen neuen Null anstoßen
+        (im Hintergrund höchstens einer gleichzeitig).
+        """
+        z = self.values()
+        self._S = _lag_sums(z, self.max_lag)
+        self._sum, self._sumsq = float(z.sum()), float(z @ z)
+        if self._pool is None:
+            self._null = self._compute_null(z, self.n_seen)
+            return
+        self._collect()
+        if self._pending is None:
+            self._pending = self._pool.submit(self._compute_null, z, self.n_seen)
+
+    def _collect(self):
+        if self._pending is not None and self._pending.done():
+            self._null = self._pending.result()
+            self._pending = None
+
+    def p_value(self):
+        self._collect()
+        stat = self.stat()
+        if self._null is None or stat is None:
+            return None
+        return float((self._null[0] >= stat).mean())
+
+    def record(self):
+        """
+        Ein Ausgabe-Datensatz: t (Samples gesamt), stat, p_value, Alter des Nulls in Samples.
+        """
+        p = self.p_value()
+        return {
+            "t": self.n_seen,
+            "n_window": self.n,
+            "stat": self.stat(),
+            "p_value": p,
+            "null_age": None if self._null is None else self.n_seen - self._null[1],
+        }
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._collect()
+            self._pool = None
+
+def iter_counts(stream):
+    """
+    Zahlen aus einem Text-Strom (stdin/Datei): beliebig viele pro Zeile, Leerraum/Komma getrennt, # = Kommentar.
+    """
+    for line in stream:
+        line = line.split("#")[0].replace(",", " ")
+        for tok in line.split():
+            yield float(tok)
+
+def run_monitor(stream, out=sys.stdout, emit_every=100, **kwargs):
+    """
+    Zählstrom durch einen CStarMonitor schicken und alle emit_every Samples einen JSON-Datensatz schreiben.
+    """
+    mon = CStarMonitor(**kwargs)
+    last = None
+    try:
+        for z in iter_counts(stream):
+            mon.update(z)
+            if mon.n_seen % emit_every == 0 and mon.n > mon.max_lag:
+                out.write(json.dumps(mon.record()) + "\n")
+                out.flush()
+                last = mon.n_seen
+    finally:
+        mon.close()
+    # Abschluss-Datensatz (mit dem zuletzt fertig gewordenen Null)
+    if mon.n > mon.max_lag and last != mon.n_seen:
+        out.write(json.dumps(mon.record()) + "\n")
+    return mon
@@ -1,18 +1,18 @@
 # t3_export.py
-import json, os
+import os
 from pathlib import Path
 import matplotlib.pyplot as plt
 import numpy as np
-from glob import glob
+from ogc.resultstore import load_runs
+from ogc.t3_hysteresis import _trapz
 
 def load_rows(root: str):
     rows = []
-    for p in sorted(glob(os.path.join(root, "t3", "*.json"))):
-        with open(p, "r", encoding="utf-8") as f:
-            j = json.load(f)
-        res = j.get("result", {})
-        prm = j.get("params", {})
-        rows.append({"path": p, "u_grid": res.get("u_grid", []),
+    # results.sqlite unter root, sonst root/t3/*.json
+    for r in load_runs(root, "t3"):
+        res = r["result"]
+        prm = r["params"]
+        rows.append({"path": r["run_id"], "u_grid": res.get("u_grid", []),
                      "forward": res.get("forward", []),
                      "backward": res.get("backward", []),
                      "A_loop": res.get("A_loop"),
@@ -39,7 +39,7 @@ def main():
 
     rows = load_rows(args.root)
     if not rows:
-        print("No T3 JSONs found.")
+        print("No T3 runs found.")
         return
 
     # Nimm den ersten als Figure-Beispiel (oder nimm Median A_loop)
@@ -54,7 +54,7 @@ def main():
     Path(os.path.dirname(args.out_fig) or ".").mkdir(parents=True, exist_ok=True)
     plot_loop(u, fwd, bwd, args.out_fig)
 
-    A = float(r["A_loop"]) if r["A_loop"] is not None else float(np.trapz(np.abs(fwd-bwd), u))
+    A = float(r["A_loop"]) if r["A_loop"] is not None else float(_trapz(np.abs(fwd-bwd), u))
     tex = f"""
 % Auto-generated: T3 hysteresis loop
 \\begin{{figure}}[ht]